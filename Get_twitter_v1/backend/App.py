@@ -3,12 +3,24 @@ import requests
 import time
 import signal
 import sys
+import queue
+import threading
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 
 from database import TweetDatabase
 from ai_summarizer import AISummarizer
 from dingtalk_bot import dingtalk_bot
+from engagement import ViralSpikeDetector
+from tweet_queue import TweetPriorityQueue
+from webhook_server import start_webhook_server
+from thread_aggregator import ThreadAggregator
+
+
+# 过滤规则标签前缀，只管理本程序创建的规则
+FILTER_RULE_TAG_PREFIX = "get_twitter_v1"
+# 单条过滤规则的最大长度，超过时拆分为多条规则
+FILTER_RULE_MAX_LENGTH = 255
 
 
 class TwitterAPIIOMonitor:
@@ -35,6 +47,11 @@ class TwitterAPIIOMonitor:
         # 🔧 修改：默认只获取5条最新推文，节省token
         self.max_tweets_per_request = int(os.getenv("MAX_TWEETS_PER_REQUEST", "5"))
 
+        # 🔧 推送模式配置：push 模式下由 Webhook 接收推文，轮询只作为低频兜底
+        self.ingest_mode = os.getenv("INGEST_MODE", "poll")
+        self.reconcile_interval = int(os.getenv("RECONCILE_INTERVAL", "1800"))  # 兜底轮询间隔，默认30分钟
+        self.filter_rule_interval = float(os.getenv("FILTER_RULE_INTERVAL", "60"))  # 过滤规则检查间隔(秒)
+
         # 控制程序运行的标志
         self.running = True
 
@@ -45,6 +62,20 @@ class TwitterAPIIOMonitor:
         self.db = TweetDatabase()  # 初始化数据库模块
         self.ai_summarizer = AISummarizer()  # 初始化AI摘要模块
 
+        # 初始化爆款检测，并用数据库中的历史推文预热基线
+        self.spike_detector = ViralSpikeDetector(self.target_users)
+        self.spike_detector.load_history(
+            self.db.fetch_recent_engagement(self.target_users, self.spike_detector.window))
+
+        # 抓取与摘要/推送之间的优先级队列
+        self.tweet_queue = TweetPriorityQueue()
+        # 同一会话的推文先在防抖窗口内聚合，合并成一条摘要和一条通知
+        self.thread_aggregator = ThreadAggregator()
+        # Webhook/兜底轮询线程只把原始推文放入接收队列，由主线程统一去重和处理
+        self.intake = queue.Queue()
+        # 已入队但尚未写入数据库的推文ID，避免 Webhook 与兜底轮询重复处理
+        self.pending_ids = set()
+
         print(f"🎯 监控目标: {', '.join(['@' + user for user in self.target_users])}")
         print(f"⏰ 监控间隔: {self.monitor_interval} 秒")
         print(f"📊 每次获取: {self.max_tweets_per_request} 条推文 (节省token模式)")
@@ -94,11 +125,13 @@ class TwitterAPIIOMonitor:
         # 时间处理 - 转换为北京时间
         created_at_raw = tweet.get('createdAt')
         beijing_time = created_at_raw
+        created_dt = None
 
         if created_at_raw:
             try:
                 # 解析格式：'Sat Nov 22 04:00:00 +0000 2025'
                 dt = datetime.strptime(created_at_raw, '%a %b %d %H:%M:%S %z %Y')
+                created_dt = dt
                 # 转换为UTC+8北京时间
                 beijing_tz = timezone(timedelta(hours=8))
                 dt_beijing = dt.astimezone(beijing_tz)
@@ -108,6 +141,7 @@ class TwitterAPIIOMonitor:
                 try:
                     # 尝试ISO格式
                     dt = datetime.fromisoformat(created_at_raw.replace('Z', '+00:00'))
+                    created_dt = dt
                     beijing_tz = timezone(timedelta(hours=8))
                     dt_beijing = dt.astimezone(beijing_tz)
                     beijing_time = dt_beijing.strftime("%Y-%m-%d %H:%M:%S")
@@ -128,6 +162,17 @@ class TwitterAPIIOMonitor:
             f"📊 原始互动数据 - 点赞: {tweet.get('likeCount')}, 转推: {tweet.get('retweetCount')}, 回复: {tweet.get('replyCount')}, 引用: {tweet.get('quoteCount')}, 浏览: {tweet.get('viewCount')}")
         print(f"📊 处理后互动数据 - 点赞: {likes}, 转推: {retweets}, 回复: {replies}, 引用: {quotes}, 浏览: {views}")
 
+        # 互动速度 - 加权互动数 / 推文年龄(小时)，年龄至少按1分钟计算
+        age_seconds = None
+        engagement_velocity = 0.0
+        if created_dt is not None:
+            if created_dt.tzinfo is None:
+                created_dt = created_dt.replace(tzinfo=timezone.utc)
+            age_seconds = max((datetime.now(timezone.utc) - created_dt).total_seconds(), 0)
+            weighted_engagement = ((likes or 0) + 2 * (retweets or 0) + (replies or 0)
+                                   + 2 * (quotes or 0) + (views or 0) / 100)
+            engagement_velocity = weighted_engagement / (max(age_seconds, 60) / 3600)
+
         return {
             "username": username,
             "tweet_id": tweet_id,
@@ -145,6 +190,16 @@ class TwitterAPIIOMonitor:
             "source": tweet.get("source"),
             "lang": tweet.get("lang"),
             "possibly_sensitive": tweet.get("possibly_sensitive", False),
+            "bookmarkCount": tweet.get("bookmarkCount", 0),
+            "isReply": bool(tweet.get("isReply", False)),
+            "inReplyToId": tweet.get("inReplyToId"),
+            "conversationId": tweet.get("conversationId"),
+            "displayTextRange": tweet.get("displayTextRange"),
+            "inReplyToUserId": tweet.get("inReplyToUserId"),
+            "inReplyToUsername": tweet.get("inReplyToUsername"),
+            "author": tweet.get("author"),
+            "age_seconds": age_seconds,
+            "engagement_velocity": round(engagement_velocity, 2),
             "public_metrics": {
                 'like_count': likes,
                 'retweet_count': retweets,
@@ -167,7 +222,7 @@ class TwitterAPIIOMonitor:
 
         # 立即生成AI摘要
         print("🤖 正在生成AI摘要...")
-        ai_summary = self.ai_summarizer.generate_summary(tweet_data)
+        ai_summary, llm_usage = self.ai_summarizer.summarize(tweet_data)
         tweet_data['ai_summary'] = ai_summary
 
         print("🤖 AI摘要:")
@@ -176,6 +231,7 @@ class TwitterAPIIOMonitor:
 
         # 写入数据库
         self.db.insert_tweet(tweet_data)
+        self.db.record_llm_usage(tweet_data, llm_usage)
 
         # 立即发送钉钉通知
         print("📤 正在发送钉钉通知...")
@@ -190,27 +246,155 @@ class TwitterAPIIOMonitor:
 
         return True
 
+    def send_viral_alerts(self, formatted_tweets):
+        """批量检测爆款推文并发送优先预警"""
+        try:
+            spikes = self.spike_detector.score(formatted_tweets)
+            self.spike_detector.observe(formatted_tweets)
+        except Exception as e:
+            print(f"❌ 爆款检测失败: {e}")
+            return 0
+
+        alert_count = 0
+        for tweet, spike in zip(formatted_tweets, spikes):
+            if not spike:
+                continue
+            tweet['viral_spike'] = spike
+            print(f"🚨 爆款预警: @{tweet['username']} {spike['metric']} {spike['current']} "
+                  f"(基线 {spike['baseline']}, 分数 {spike['score']})")
+            if dingtalk_bot.send_viral_alert(tweet, spike):
+                alert_count += 1
+            else:
+                print("❌ 爆款预警发送失败")
+        return alert_count
+
+    def process_thread(self, lead, previous_parts):
+        """处理线程 - 多条推文合并生成一条AI摘要并推送一条通知"""
+        new_parts = lead['thread_parts']
+        all_texts = [part['text'] for part in previous_parts] + [part['text'] for part in new_parts]
+        total = len(all_texts)
+        is_update = bool(previous_parts)
+
+        print("\n" + "=" * 60)
+        print(f"🧵 捕获到{'线程更新' if is_update else '新线程'}！")
+        print(f"👤 用户: @{lead['username']}")
+        print(f"🧩 共 {total} 条，本次新增 {len(new_parts)} 条 (会话 {lead.get('conversationId')})")
+
+        # 合并全部推文生成一条摘要
+        thread_data = dict(lead)
+        thread_data['text'] = "\n\n".join(f"({i}/{total}) {text}" for i, text in enumerate(all_texts, 1))
+        for field in ('likes', 'retweets', 'replies', 'views'):
+            thread_data[field] = sum(part.get(field) or 0 for part in new_parts)
+        thread_data['public_metrics'] = {
+            'like_count': thread_data['likes'],
+            'retweet_count': thread_data['retweets'],
+            'reply_count': thread_data['replies'],
+        }
+
+        print("🤖 正在生成线程AI摘要...")
+        ai_summary, llm_usage = self.ai_summarizer.summarize(thread_data)
+        thread_data['ai_summary'] = ai_summary
+
+        print("🤖 AI摘要:")
+        print(f"   {ai_summary}")
+        print("=" * 60)
+
+        # 每条推文单独入库，摘要使用线程合并摘要
+        for part in new_parts:
+            part['ai_summary'] = ai_summary
+            self.db.insert_tweet(part)
+        self.db.record_llm_usage(lead, llm_usage)
+
+        print("📤 正在发送钉钉线程通知...")
+        success = dingtalk_bot.send_thread_notification(thread_data, total, len(new_parts), is_update)
+        if success:
+            print("✅ 钉钉通知发送成功")
+        else:
+            print("❌ 钉钉通知发送失败")
+
+        # 添加延迟避免频繁请求
+        time.sleep(2)
+
+        return True
+
+    def enqueue_tweets(self, formatted_tweets, flush_threads=True):
+        """新推文先批量检测爆款并优先预警，然后按会话聚合后放入优先级队列"""
+        if formatted_tweets:
+            # 先批量检测爆款，优先发送预警，不必等待逐条摘要
+            self.send_viral_alerts(formatted_tweets)
+
+            for tweet in formatted_tweets:
+                self.thread_aggregator.add(tweet)
+
+        self.flush_threads(force=flush_threads)
+
+    def flush_threads(self, force=False):
+        """把防抖窗口已结束的线程放入优先级队列"""
+        for lead in self.thread_aggregator.flush(force=force):
+            self.tweet_queue.push(lead)
+
+    def process_next_tweet(self):
+        """取出优先级最高的推文(线程)并处理，返回处理成功的推文条数，队列为空时返回 None"""
+        lead = self.tweet_queue.pop()
+        if lead is None:
+            return None
+
+        parts = lead.get('thread_parts') or [lead]
+        print(f"🏷️ 优先级 {lead.get('priority')}: @{lead['username']} "
+              f"(互动速度 {lead.get('engagement_velocity')}/小时, {len(parts)} 条)")
+
+        try:
+            # 自己线程的后续部分才合并数据库中同一作者在该会话下的历史推文，回复他人的推文单独处理
+            previous_parts = []
+            conversation_id = lead.get('conversationId')
+            if conversation_id and conversation_id != lead['tweet_id'] and ThreadAggregator.is_self_reply(lead):
+                previous_parts = self.db.get_conversation_tweets(conversation_id, lead['username'])
+
+            if len(parts) == 1 and not previous_parts:
+                self.process_single_tweet(parts[0])
+            else:
+                self.process_thread(lead, previous_parts)
+            return len(parts)
+        except Exception as e:
+            print(f"❌ 处理推文失败: {e}")
+            return 0
+        finally:
+            for part in parts:
+                self.pending_ids.discard(part['tweet_id'])
+
     def process_new_tweets(self, formatted_tweets):
-        """处理新推文 - 逐条处理并立即推送"""
+        """处理新推文 - 按优先级逐条处理并立即推送"""
         if not formatted_tweets:
             return 0
 
-        print(f"🤖 发现 {len(formatted_tweets)} 条新推文，开始逐条处理...")
+        self.enqueue_tweets(formatted_tweets)
+
+        print(f"🤖 发现 {len(formatted_tweets)} 条新推文，按会话合并后队列中共 {len(self.tweet_queue)} 项，按优先级逐条处理...")
 
         processed_count = 0
-        for tweet in formatted_tweets:
+        while self.running:
+            result = self.process_next_tweet()
+            if result is None:
+                break
+            processed_count += result
+
+        return processed_count
+
+    def collect_new_tweets(self, username, tweets):
+        """过滤掉已入库或已在队列中的推文，并标准化新推文"""
+        new_tweets = []
+        for tweet in tweets:
             if not self.running:
                 break
 
-            try:
-                self.process_single_tweet(tweet)
-                processed_count += 1
-            except Exception as e:
-                print(f"❌ 处理推文失败: {e}")
-                # 继续处理下一条推文
+            tweet_id = tweet.get("id")
+            if not tweet_id or tweet_id in self.pending_ids or self.db.tweet_exists(tweet_id):
                 continue
 
-        return processed_count
+            formatted = self.format_tweet(tweet, username)
+            self.pending_ids.add(tweet_id)
+            new_tweets.append(formatted)
+        return new_tweets
 
     def monitor_single_cycle(self):
         """执行单次监控循环"""
@@ -227,15 +411,7 @@ class TwitterAPIIOMonitor:
             tweets = self.get_latest_tweets(username)
             total_checked += len(tweets)
 
-            new_tweets = []
-            for tweet in tweets:
-                if not self.running:
-                    break
-
-                tweet_id = tweet.get("id")
-                if tweet_id and not self.db.tweet_exists(tweet_id):
-                    formatted = self.format_tweet(tweet, username)
-                    new_tweets.append(formatted)
+            new_tweets = self.collect_new_tweets(username, tweets)
 
             if new_tweets:
                 print(f"✅ @{username}: 发现 {len(new_tweets)} 条新推文")
@@ -284,11 +460,145 @@ class TwitterAPIIOMonitor:
 
         print("\n🛑 监控已停止")
 
+    def get_filter_rules(self):
+        """获取账号下已有的推文过滤规则"""
+        endpoint = f"{self.base_url}/oapi/tweet_filter/get_rules"
+        resp = requests.get(endpoint, headers=self.headers, timeout=30)
+        if resp.status_code != 200:
+            raise RuntimeError(f"获取过滤规则失败: {resp.status_code} - {resp.text}")
+        return resp.json().get("rules", []) or []
+
+    def build_filter_rule_values(self):
+        """按 TARGET_USERS 生成过滤规则，过长时拆分为多条"""
+        values = []
+        current = ""
+        for user in self.target_users:
+            clause = f"from:{user}"
+            candidate = f"{current} OR {clause}" if current else clause
+            if current and len(candidate) > FILTER_RULE_MAX_LENGTH:
+                values.append(current)
+                candidate = clause
+            current = candidate
+        if current:
+            values.append(current)
+        return values
+
+    def sync_filter_rules(self):
+        """让 twitterapi.io 上本程序管理的过滤规则与 TARGET_USERS 保持一致"""
+        desired = self.build_filter_rule_values()
+        existing = [rule for rule in self.get_filter_rules()
+                    if str(rule.get("tag", "")).startswith(FILTER_RULE_TAG_PREFIX)]
+        existing_values = {rule.get("value"): rule for rule in existing}
+
+        for rule in existing:
+            if rule.get("value") not in desired:
+                resp = requests.delete(f"{self.base_url}/oapi/tweet_filter/delete_rule",
+                                       headers=self.headers, json={"rule_id": rule["rule_id"]}, timeout=30)
+                print(f"🗑️ 删除过期过滤规则 {rule.get('tag')}: {resp.status_code}")
+
+        for i, value in enumerate(desired):
+            tag = f"{FILTER_RULE_TAG_PREFIX}-{i + 1}"
+            rule = existing_values.get(value)
+            if rule is None:
+                resp = requests.post(f"{self.base_url}/oapi/tweet_filter/add_rule", headers=self.headers,
+                                     json={"tag": tag, "value": value, "interval_seconds": self.filter_rule_interval},
+                                     timeout=30)
+                if resp.status_code != 200:
+                    print(f"❌ 添加过滤规则失败: {resp.status_code} - {resp.text}")
+                    continue
+                rule_id = resp.json().get("rule_id")
+                print(f"✅ 已添加过滤规则 {tag}: {value}")
+            else:
+                rule_id = rule["rule_id"]
+
+            # 新规则默认不生效，需要显式激活
+            resp = requests.post(f"{self.base_url}/oapi/tweet_filter/update_rule", headers=self.headers,
+                                 json={"rule_id": rule_id, "tag": tag, "value": value,
+                                       "interval_seconds": self.filter_rule_interval, "is_effect": 1},
+                                 timeout=30)
+            if resp.status_code != 200:
+                print(f"❌ 激活过滤规则失败: {resp.status_code} - {resp.text}")
+
+        print(f"📋 过滤规则同步完成: {len(desired)} 条规则覆盖 {len(self.target_users)} 个账号")
+
+    def ingest_raw_tweet(self, username, tweet, source="webhook"):
+        """接收原始推文，线程安全，可由 Webhook 或兜底轮询线程调用"""
+        self.intake.put((username, tweet, source))
+
+    def drain_intake(self, timeout=1.0):
+        """取出接收队列中的全部推文，去重并标准化，timeout 为 0 时不等待"""
+        try:
+            items = [self.intake.get(timeout=timeout) if timeout > 0 else self.intake.get_nowait()]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                items.append(self.intake.get_nowait())
+            except queue.Empty:
+                break
+
+        new_tweets = []
+        for username, tweet, source in items:
+            formatted = self.collect_new_tweets(username, [tweet])
+            if formatted:
+                print(f"✅ @{username}: 发现新推文 (来源: {source})")
+            new_tweets.extend(formatted)
+        return new_tweets
+
+    def reconcile_loop(self):
+        """兜底轮询：低频拉取最新推文，补齐 Webhook 可能漏掉的推文"""
+        while self.running:
+            for _ in range(self.reconcile_interval):
+                if not self.running:
+                    return
+                time.sleep(1)
+
+            print(f"\n🔁 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始兜底轮询...")
+            for username in self.target_users:
+                if not self.running:
+                    return
+                for tweet in self.get_latest_tweets(username):
+                    self.ingest_raw_tweet(username, tweet, source="reconcile")
+
+    def start_push_monitoring(self):
+        """启动推送模式监控：Webhook 实时接收，轮询只做兜底"""
+        print("🚀 启动 Twitter 推送模式监控...")
+        print("💡 按 Ctrl+C 停止监控")
+
+        try:
+            self.sync_filter_rules()
+        except Exception as e:
+            print(f"❌ 过滤规则同步失败: {e}")
+
+        start_webhook_server(self)
+        threading.Thread(target=self.reconcile_loop, daemon=True).start()
+        print(f"🔁 兜底轮询间隔: {self.reconcile_interval} 秒")
+
+        # 启动时先补齐一次，覆盖程序停止期间错过的推文
+        for username in self.target_users:
+            for tweet in self.get_latest_tweets(username):
+                self.ingest_raw_tweet(username, tweet, source="reconcile")
+
+        while self.running:
+            try:
+                # 队列中还有待处理推文时不等待新推文，避免每条推文都空等 1 秒
+                new_tweets = self.drain_intake(timeout=0 if len(self.tweet_queue) else 1.0)
+                self.enqueue_tweets(new_tweets, flush_threads=False)
+                self.process_next_tweet()
+            except Exception as e:
+                print(f"❌ 推送处理出错: {e}")
+                # 继续运行，不退出
+
+        print("\n🛑 监控已停止")
+
 
 def main():
     try:
         monitor = TwitterAPIIOMonitor()
-        monitor.start_real_time_monitoring()
+        if monitor.ingest_mode == "push":
+            monitor.start_push_monitoring()
+        else:
+            monitor.start_real_time_monitoring()
     except KeyboardInterrupt:
         print("\n👋 用户主动停止监控")
     except Exception as e:
@@ -298,4 +608,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -106,9 +106,12 @@
 #         return summarized_tweets
 import os
 import json
+import time
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from summary_policy import SummaryPolicy, compact_text, estimate_cost
+
 
 class AISummarizer:
     def __init__(self):
@@ -126,8 +129,8 @@ class AISummarizer:
             base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",  # 北京地域
         )
 
-        # 设置模型
-        self.model = "qwen-plus"  # 可根据需要改为 qwen-max 或 qwen-flash
+        # 摘要策略：按推文内容和互动情况选择模板摘要或 qwen-flash / qwen-plus / qwen-max
+        self.policy = SummaryPolicy()
 
     def generate_summary(self, formatted_tweet):
         """
@@ -139,34 +142,56 @@ class AISummarizer:
         Returns:
             str: 生成的摘要文本
         """
+        summary, _ = self.summarize(formatted_tweet)
+        return summary
+
+    def summarize(self, formatted_tweet):
+        """
+        按摘要策略生成推文摘要，并返回用量信息
+
+        Args:
+            formatted_tweet: 格式化后的推文数据
+
+        Returns:
+            tuple: (摘要文本, 用量字典)，用量包含模型、token数、耗时(毫秒)和估算费用(元)
+        """
+        decision = self.policy.decide(formatted_tweet)
+        usage = {
+            "model": decision["model"],
+            "reason": decision["reason"],
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "latency_ms": 0,
+            "cost": 0.0,
+            "skipped": decision["action"] == "template",
+        }
+
+        if decision["action"] == "template":
+            print(f"⚡ 跳过大模型 ({decision['reason']})，使用模板摘要")
+            return self.policy.template_summary(formatted_tweet, decision["reason"]), usage
+
+        model = decision["model"]
+        started = time.perf_counter()
         try:
-            # 构建推文内容
-            tweet_content = formatted_tweet.get('text', '')
+            # 构建推文内容，去掉链接并压缩空白
+            tweet_content = compact_text(formatted_tweet.get('text', ''))
             username = formatted_tweet.get('username', '')
             metrics = formatted_tweet.get('public_metrics', {})
 
             # 构建提示词
-            prompt = f"""
-请对以下推文内容进行摘要分析：
+            prompt = (f"发布者: @{username}\n"
+                      f"推文: {tweet_content}\n"
+                      f"互动: 赞{metrics.get('like_count', 0)} 转{metrics.get('retweet_count', 0)} 评{metrics.get('reply_count', 0)}\n"
+                      f"请概括主要内容、情感倾向、话题标签和热度，纯文本，不超过150字。")
 
-发布者: @{username}
-推文内容: {tweet_content}
-互动数据: 点赞{metrics.get('like_count', 0)} | 转推{metrics.get('retweet_count', 0)} | 回复{metrics.get('reply_count', 0)}
-
-请从以下角度生成一个简洁的摘要：
-1. 主要内容概括
-2. 情感倾向分析
-3. 可能的话题标签建议
-4. 相关话题热度情况
-
-要求：回复内容为纯文本，不超过150字。
-"""
+            print(f"🧠 使用模型 {model} ({decision['reason']})")
 
             # 调用阿里云百炼API
             response = self.client.chat.completions.create(
-                model=self.model,
+                model=model,
                 messages=[
-                    {"role": "system", "content": "你是一个专业的社交媒体内容分析师，擅长用简洁的语言概括推文内容。"},
+                    {"role": "system", "content": "你是社交媒体内容分析师，用简洁的语言概括推文。"},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,  # 较低的温度值以获得更稳定的输出
@@ -175,11 +200,21 @@ class AISummarizer:
 
             # 提取生成的摘要
             summary = response.choices[0].message.content.strip()
-            return summary
+
+            # 记录 token 用量、耗时和费用
+            if response.usage is not None:
+                usage["prompt_tokens"] = response.usage.prompt_tokens or 0
+                usage["completion_tokens"] = response.usage.completion_tokens or 0
+                usage["total_tokens"] = response.usage.total_tokens or 0
+            usage["latency_ms"] = int((time.perf_counter() - started) * 1000)
+            usage["cost"] = estimate_cost(model, usage["prompt_tokens"], usage["completion_tokens"])
+            print(f"📐 用量: {usage['total_tokens']} tokens, {usage['latency_ms']} ms, ¥{usage['cost']}")
+            return summary, usage
 
         except Exception as e:
+            usage["latency_ms"] = int((time.perf_counter() - started) * 1000)
             print(f"AI摘要生成失败: {e}")
-            return f"摘要生成失败: {str(e)}"
+            return f"摘要生成失败: {str(e)}", usage
 
     def batch_summarize(self, tweets_list):
         """
@@ -206,7 +241,6 @@ class AISummarizer:
             summarized_tweets.append(tweet_with_summary)
 
             # 添加延迟避免API限制
-            import time
             time.sleep(1)
 
         return summarized_tweets
\ No newline at end of file
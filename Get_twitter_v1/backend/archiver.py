@@ -0,0 +1,334 @@
+import os
+import re
+import json
+import hashlib
+import itertools
+from datetime import datetime, timezone, timedelta
+from dotenv import load_dotenv
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from database import TweetDatabase
+
+
+BEIJING_TZ = timezone(timedelta(hours=8))
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+# 归档文件的列结构，JSON 字段以字符串形式保存
+ARCHIVE_SCHEMA = pa.schema([
+    ("tweet_id", pa.string()),
+    ("username", pa.string()),
+    ("text", pa.string()),
+    ("source", pa.string()),
+    ("retweetCount", pa.int64()),
+    ("replyCount", pa.int64()),
+    ("likeCount", pa.int64()),
+    ("quoteCount", pa.int64()),
+    ("viewCount", pa.int64()),
+    ("createdAt", pa.string()),
+    ("lang", pa.string()),
+    ("bookmarkCount", pa.int64()),
+    ("isReply", pa.bool_()),
+    ("inReplyToId", pa.string()),
+    ("conversationId", pa.string()),
+    ("displayTextRange", pa.string()),
+    ("inReplyToUserId", pa.string()),
+    ("inReplyToUsername", pa.string()),
+    ("author", pa.string()),
+    ("raw_tweet", pa.string()),
+    ("ai_summary", pa.string()),
+])
+
+JSON_COLUMNS = ("displayTextRange", "author", "raw_tweet")
+
+
+def _normalize_row(row):
+    """把数据库行转换成符合归档结构的字典"""
+    normalized = {}
+    for field in ARCHIVE_SCHEMA:
+        value = row.get(field.name)
+        if isinstance(value, (bytes, bytearray)):
+            value = value.decode("utf-8")
+        if field.name in JSON_COLUMNS and value is not None and not isinstance(value, str):
+            value = json.dumps(value, ensure_ascii=False)
+        if field.name == "isReply" and value is not None:
+            value = bool(value)
+        normalized[field.name] = value
+    return normalized
+
+
+def _partition_date(row):
+    created_at = row.get("createdAt") or ""
+    return created_at[:10] if DATE_PATTERN.match(created_at) else None
+
+
+class _PartitionWriter:
+    """单个日期分区的流式写入器，每个数据块写成一个 row group"""
+
+    def __init__(self, archive_dir, date, run_id):
+        self.date = date
+        self.relative_path = os.path.join(f"date={date}", f"part-{run_id}.parquet")
+        self.path = os.path.join(archive_dir, self.relative_path)
+        self.tmp_path = self.path + ".tmp"
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self.writer = pq.ParquetWriter(self.tmp_path, ARCHIVE_SCHEMA, compression="zstd")
+        self.rows = 0
+        self.min_created_at = None
+        self.max_created_at = None
+
+    def write(self, rows):
+        table = pa.Table.from_pylist([_normalize_row(row) for row in rows], schema=ARCHIVE_SCHEMA)
+        self.writer.write_table(table)
+        self.rows += len(rows)
+        if self.min_created_at is None:
+            self.min_created_at = rows[0]["createdAt"]
+        self.max_created_at = rows[-1]["createdAt"]
+
+    def close(self):
+        self.writer.close()
+
+    def commit(self):
+        """校验通过后把临时文件改名为正式文件，此后文件不会再被删除"""
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        """丢弃尚未提交的临时文件"""
+        self.writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class TweetArchiver:
+    def __init__(self, db=None):
+        # 加载环境变量
+        load_dotenv()
+
+        # .env 中留空的配置项会被读成空字符串，按未配置处理
+        self.archive_dir = os.getenv("ARCHIVE_DIR") or "archive"
+        self.retention_days = int(os.getenv("ARCHIVE_RETENTION_DAYS") or "30")  # 热表保留天数
+        self.chunk_size = int(os.getenv("ARCHIVE_CHUNK_SIZE") or "1000")  # 每批读取行数，决定内存上限
+
+        self.manifest_path = os.path.join(self.archive_dir, "manifest.json")
+        self.db = db or TweetDatabase()
+
+    def load_manifest(self):
+        """读取归档清单"""
+        if not os.path.exists(self.manifest_path):
+            return {"version": 1, "files": []}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest):
+        """原子写入归档清单"""
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _file_sha256(path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _iter_archived_ids(self, path):
+        """从归档文件中分批读出 tweet_id，用于清理热表"""
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=self.chunk_size, columns=["tweet_id"]):
+            yield batch.column(0).to_pylist()
+
+    def _finalize_partition(self, partition, cutoff, run_id):
+        """校验分区文件行数，提交文件并写入清单后清理热表"""
+        start = f"{partition.date} 00:00:00"
+        next_day = datetime.strptime(partition.date, "%Y-%m-%d") + timedelta(days=1)
+        end = min(next_day.strftime("%Y-%m-%d %H:%M:%S"), cutoff)
+
+        try:
+            partition.close()
+            file_rows = pq.ParquetFile(partition.tmp_path).metadata.num_rows
+            db_rows = self.db.count_unarchived_between(start, end)
+        except Exception:
+            partition.discard()
+            raise
+        if not (partition.rows == file_rows == db_rows):
+            print(f"❌ 分区 {partition.date} 行数校验失败: 写入 {partition.rows}, 文件 {file_rows}, 数据库 {db_rows}，跳过清理")
+            partition.discard()
+            return False
+
+        partition.commit()
+        manifest = self.load_manifest()
+        entry = {
+            "date": partition.date,
+            "path": partition.relative_path,
+            "rows": file_rows,
+            "min_created_at": partition.min_created_at,
+            "max_created_at": partition.max_created_at,
+            "sha256": self._file_sha256(partition.path),
+            "run_id": run_id,
+            "prune_status": "pending",  # 清理完成后改为 done，中断时下次运行会继续清理
+            "archived_at": datetime.now(BEIJING_TZ).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        manifest["files"].append(entry)
+        self._save_manifest(manifest)
+
+        self._prune_entry(entry)
+        return True
+
+    def _prune_entry(self, entry):
+        """按归档文件中的 tweet_id 清理热表，完成后在清单中标记"""
+        pruned = 0
+        try:
+            for tweet_ids in self._iter_archived_ids(os.path.join(self.archive_dir, entry["path"])):
+                pruned += self.db.prune_archived(tweet_ids)
+        except Exception:
+            print(f"❌ 分区 {entry['date']} 热表清理中断，归档文件已保留，下次运行时会继续清理")
+            raise
+
+        manifest = self.load_manifest()
+        for item in manifest["files"]:
+            if item["path"] == entry["path"]:
+                item["prune_status"] = "done"
+        self._save_manifest(manifest)
+        print(f"✅ 分区 {entry['date']}: 归档 {entry['rows']} 条，热表瘦身 {pruned} 条")
+
+    def resume_pending_prunes(self):
+        """继续上次中断的热表清理，避免剩余行被重复归档到新文件"""
+        pending = [entry for entry in self.load_manifest()["files"]
+                   if entry.get("prune_status", "done") != "done"]
+        for entry in pending:
+            print(f"🔁 继续清理分区 {entry['date']} ({entry['path']})")
+            self._prune_entry(entry)
+        return len(pending)
+
+    def archive(self):
+        """
+        将早于保留期的推文流式导出为按日期分区的 Parquet 文件并清理热表
+
+        Returns:
+            dict: 本次归档的统计信息
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        cutoff = (datetime.now(BEIJING_TZ) - timedelta(days=self.retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+        run_id = datetime.now(BEIJING_TZ).strftime("%Y%m%dT%H%M%S")
+        print(f"🗄️ 开始归档 {cutoff} (北京时间) 之前的推文，每批 {self.chunk_size} 条...")
+
+        stats = {"archived": 0, "partitions": 0, "failed_partitions": 0, "skipped": 0}
+        stats["resumed"] = self.resume_pending_prunes()
+        partition = None
+        after_key = None
+
+        try:
+            while True:
+                rows = self.db.fetch_archive_chunk(cutoff, after_key, self.chunk_size)
+                if not rows:
+                    break
+                after_key = (rows[-1]["createdAt"], rows[-1]["tweet_id"])
+
+                # 行按 createdAt 有序，同一日期的行是连续的，同一时刻只需打开一个分区文件
+                for date, group in itertools.groupby(rows, key=_partition_date):
+                    group = list(group)
+                    if date is None:
+                        stats["skipped"] += len(group)
+                        continue
+
+                    if partition is None or partition.date != date:
+                        # 先解除绑定再收尾，收尾出错时不会误删已提交的文件
+                        finished, partition = partition, None
+                        if finished is not None:
+                            self._record_partition(stats, finished, cutoff, run_id)
+                        partition = _PartitionWriter(self.archive_dir, date, run_id)
+                    partition.write(group)
+
+            finished, partition = partition, None
+            if finished is not None:
+                self._record_partition(stats, finished, cutoff, run_id)
+        except Exception:
+            if partition is not None:
+                partition.discard()
+            raise
+
+        print(f"🎉 归档完成: {stats['archived']} 条推文，{stats['partitions']} 个分区，"
+              f"校验失败 {stats['failed_partitions']} 个，跳过无法解析时间的 {stats['skipped']} 条")
+        return stats
+
+    def _record_partition(self, stats, partition, cutoff, run_id):
+        if self._finalize_partition(partition, cutoff, run_id):
+            stats["archived"] += partition.rows
+            stats["partitions"] += 1
+        else:
+            stats["failed_partitions"] += 1
+
+
+class TweetArchiveReader:
+    """按清单扫描归档文件，供离线分析使用"""
+
+    def __init__(self, archive_dir=None):
+        load_dotenv()
+        self.archive_dir = archive_dir or os.getenv("ARCHIVE_DIR") or "archive"
+        self.manifest_path = os.path.join(self.archive_dir, "manifest.json")
+
+    def list_files(self, start_date=None, end_date=None):
+        """
+        列出日期范围内的归档文件 (日期格式 'YYYY-MM-DD'，两端都包含)
+        """
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        files = []
+        for entry in manifest.get("files", []):
+            if start_date and entry["date"] < start_date:
+                continue
+            if end_date and entry["date"] > end_date:
+                continue
+            files.append(entry)
+        return sorted(files, key=lambda entry: (entry["date"], entry["path"]))
+
+    def count_rows(self, start_date=None, end_date=None):
+        """根据清单统计行数，无需读取文件"""
+        return sum(entry["rows"] for entry in self.list_files(start_date, end_date))
+
+    def iter_batches(self, start_date=None, end_date=None, columns=None, batch_size=10000):
+        """
+        逐批读取归档数据，内存占用只与 batch_size 有关
+
+        Yields:
+            pyarrow.RecordBatch
+        """
+        for entry in self.list_files(start_date, end_date):
+            parquet_file = pq.ParquetFile(os.path.join(self.archive_dir, entry["path"]))
+            for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+                yield batch
+
+    def iter_rows(self, start_date=None, end_date=None, columns=None, batch_size=10000):
+        """
+        逐行读取归档数据，JSON 字段会被解析回对象
+
+        Yields:
+            dict: 单条推文
+        """
+        for batch in self.iter_batches(start_date, end_date, columns, batch_size):
+            for row in batch.to_pylist():
+                for column in JSON_COLUMNS:
+                    if row.get(column):
+                        row[column] = json.loads(row[column])
+                yield row
+
+
+def main():
+    try:
+        archiver = TweetArchiver()
+        archiver.archive()
+    except Exception as e:
+        print(f"💥 归档任务出错: {e}")
+    finally:
+        print("🎯 归档程序已退出")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,33 @@
 import os
 import json
+import math
+from datetime import datetime
 import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
 
 
+# 汇总表统计的互动指标: 格式化推文字段 -> 汇总表列前缀
+ROLLUP_METRICS = {"likes": "like", "retweets": "retweet", "views": "view"}
+ROLLUP_GRANULARITIES = {"hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00"}
+PERCENTILES = (50, 90, 99)
+
+
+def engagement_bin(value):
+    """把互动数映射到 log2 分桶：0 -> 0，[2^(b-1), 2^b) -> b"""
+    value = int(value or 0)
+    if value <= 0:
+        return 0
+    return min(value.bit_length(), 63)
+
+
+def bin_estimate(bin_index):
+    """分桶的代表值 (桶内几何中点)"""
+    if bin_index <= 0:
+        return 0
+    return int(round(math.pow(2, bin_index - 0.5)))
+
+
 class TweetDatabase:
     def __init__(self):
         load_dotenv()
@@ -17,6 +40,8 @@ class TweetDatabase:
         self.conn = None
         self.connect()
         self.create_table()
+        self.create_rollup_tables()
+        self.create_llm_usage_table()
 
     def connect(self):
         try:
@@ -54,15 +79,134 @@ class TweetDatabase:
             inReplyToUsername VARCHAR(255),
             author JSON,
             raw_tweet JSON,
-            ai_summary TEXT
+            ai_summary TEXT,
+            fetchAgeSeconds INT NULL,
+            archived_at DATETIME NULL,
+            INDEX idx_archive_scan (archived_at, createdAt, tweet_id),
+            INDEX idx_conversation (conversationId, username)
         );
         """
         cursor = self.conn.cursor()
         cursor.execute(create_table_sql)
         cursor.close()
         self.conn.commit()
+
+        # 兼容旧表：补齐归档相关的列和索引
+        self.ensure_column("tweets", "archived_at", "DATETIME NULL")
+        # 抓取时推文已发布的秒数，爆款检测据此把互动数换算为每小时速度
+        self.ensure_column("tweets", "fetchAgeSeconds", "INT NULL")
+        # archived_at 放在最前，归档扫描可以直接跳过已瘦身的行，成本不随归档量增长
+        self.ensure_index("tweets", "idx_archive_scan", "(archived_at, createdAt, tweet_id)")
+        self.drop_index("tweets", "idx_created_tweet")
+        self.ensure_index("tweets", "idx_conversation", "(conversationId, username)")
         print("✅ 数据表检查/创建完成")
 
+    def ensure_column(self, table, column, definition):
+        """列不存在时自动添加"""
+        sql = """
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, (table, column))
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(f"ALTER TABLE `{table}` ADD COLUMN `{column}` {definition}")
+                self.conn.commit()
+                print(f"✅ 已为 {table} 添加列: {column}")
+        finally:
+            cursor.close()
+
+    def ensure_index(self, table, index_name, columns):
+        """索引不存在时自动创建"""
+        sql = """
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, (table, index_name))
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(f"CREATE INDEX `{index_name}` ON `{table}` {columns}")
+                self.conn.commit()
+                print(f"✅ 已为 {table} 创建索引: {index_name}")
+        finally:
+            cursor.close()
+
+    def create_rollup_tables(self):
+        """创建按账号的小时/天互动汇总表及其分桶直方图表"""
+        create_rollups_sql = """
+        CREATE TABLE IF NOT EXISTS account_rollups (
+            username VARCHAR(255) NOT NULL,
+            granularity VARCHAR(8) NOT NULL,
+            bucket_start DATETIME NOT NULL,
+            tweet_count INT DEFAULT 0,
+            like_sum BIGINT DEFAULT 0,
+            retweet_sum BIGINT DEFAULT 0,
+            view_sum BIGINT DEFAULT 0,
+            PRIMARY KEY (username, granularity, bucket_start),
+            INDEX idx_granularity_bucket (granularity, bucket_start)
+        );
+        """
+        create_hist_sql = """
+        CREATE TABLE IF NOT EXISTS account_rollup_hist (
+            username VARCHAR(255) NOT NULL,
+            granularity VARCHAR(8) NOT NULL,
+            bucket_start DATETIME NOT NULL,
+            metric VARCHAR(16) NOT NULL,
+            bin TINYINT NOT NULL,
+            count INT DEFAULT 0,
+            PRIMARY KEY (username, granularity, bucket_start, metric, bin)
+        );
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(create_rollups_sql)
+        cursor.execute(create_hist_sql)
+        cursor.close()
+        self.conn.commit()
+        print("✅ 互动汇总表检查/创建完成")
+
+    def create_llm_usage_table(self):
+        """创建大模型调用用量表"""
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            tweet_id VARCHAR(30),
+            username VARCHAR(255),
+            model VARCHAR(64),
+            reason VARCHAR(32),
+            skipped BOOLEAN DEFAULT FALSE,
+            prompt_tokens INT DEFAULT 0,
+            completion_tokens INT DEFAULT 0,
+            total_tokens INT DEFAULT 0,
+            latency_ms INT DEFAULT 0,
+            cost DECIMAL(12, 6) DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_username_created (username, created_at)
+        );
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(create_table_sql)
+        cursor.close()
+        self.conn.commit()
+        print("✅ 大模型用量表检查/创建完成")
+
+    def drop_index(self, table, index_name):
+        """索引存在时删除"""
+        sql = """
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, (table, index_name))
+            if cursor.fetchone()[0] > 0:
+                cursor.execute(f"DROP INDEX `{index_name}` ON `{table}`")
+                self.conn.commit()
+                print(f"✅ 已删除 {table} 的旧索引: {index_name}")
+        finally:
+            cursor.close()
+
     def tweet_exists(self, tweet_id):
         """判断该推文是否已存在"""
         sql = "SELECT tweet_id FROM tweets WHERE tweet_id = %s LIMIT 1"
@@ -80,9 +224,9 @@ class TweetDatabase:
             retweetCount, replyCount, likeCount, quoteCount, viewCount,
             createdAt, lang, bookmarkCount, isReply,
             inReplyToId, conversationId, displayTextRange,
-            inReplyToUserId, inReplyToUsername, author, raw_tweet, ai_summary
+            inReplyToUserId, inReplyToUsername, author, raw_tweet, ai_summary, fetchAgeSeconds
         )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
 
         # 调试输出，检查数据是否正确
@@ -115,18 +259,351 @@ class TweetDatabase:
             tweet.get("inReplyToUsername"),
             json.dumps(tweet.get("author"), ensure_ascii=False) if tweet.get("author") else None,
             json.dumps(tweet.get("raw_tweet"), ensure_ascii=False) if tweet.get("raw_tweet") else None,
-            tweet.get("ai_summary", "")  # 添加AI摘要字段
+            tweet.get("ai_summary", ""),  # 添加AI摘要字段
+            int(tweet["age_seconds"]) if tweet.get("age_seconds") is not None else None
         )
 
         cursor = self.conn.cursor()
         try:
             cursor.execute(sql, values)
+            # 与推文写入放在同一事务中，保证汇总表与明细一致
+            self._update_rollups(cursor, tweet)
             self.conn.commit()
             print(f"✅ 数据库插入成功: tweet_id={tweet['tweet_id']}")
             print(f"✅ 插入的互动数据 - 点赞: {tweet.get('likes', 0)}, 转推: {tweet.get('retweets', 0)}, 回复: {tweet.get('replies', 0)}")
         except Error as e:
+            self.conn.rollback()
             print(f"❌ 插入失败: {e}")
             # 打印详细的错误信息
             print(f"❌ 错误详情: {e}")
         finally:
-            cursor.close()
\ No newline at end of file
+            cursor.close()
+
+    def _update_rollups(self, cursor, tweet):
+        """增量更新该推文所属小时/天的汇总数据"""
+        try:
+            created_at = datetime.strptime(tweet.get("created_at") or "", "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            print(f"⚠️ 推文时间无法解析，跳过汇总更新: {tweet.get('created_at')}")
+            return
+
+        metrics = {field: int(tweet.get(field) or 0) for field in ROLLUP_METRICS}
+        rollup_sql = """
+        INSERT INTO account_rollups (username, granularity, bucket_start, tweet_count, like_sum, retweet_sum, view_sum)
+        VALUES (%s, %s, %s, 1, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            tweet_count = tweet_count + 1,
+            like_sum = like_sum + VALUES(like_sum),
+            retweet_sum = retweet_sum + VALUES(retweet_sum),
+            view_sum = view_sum + VALUES(view_sum)
+        """
+        hist_rows = []
+        for granularity, bucket_format in ROLLUP_GRANULARITIES.items():
+            bucket_start = created_at.strftime(bucket_format)
+            cursor.execute(rollup_sql, (
+                tweet["username"], granularity, bucket_start,
+                metrics["likes"], metrics["retweets"], metrics["views"]
+            ))
+            for field, metric in ROLLUP_METRICS.items():
+                hist_rows.append((tweet["username"], granularity, bucket_start, metric, engagement_bin(metrics[field])))
+
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s, 1)"] * len(hist_rows))
+        hist_sql = f"""
+        INSERT INTO account_rollup_hist (username, granularity, bucket_start, metric, bin, count)
+        VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE count = count + 1
+        """
+        cursor.execute(hist_sql, tuple(value for row in hist_rows for value in row))
+
+    def rebuild_rollups(self):
+        """
+        根据 tweets 表全量重建汇总表和直方图
+
+        汇总表只在 insert_tweet 时增量更新，部署之前入库的推文需要调用一次本方法回填。
+        已瘦身的归档行仍保留互动数，可以一并统计。
+        """
+        metric_columns = {"like": "likeCount", "retweet": "retweetCount", "view": "viewCount"}
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("DELETE FROM account_rollup_hist")
+            cursor.execute("DELETE FROM account_rollups")
+            # DATE_FORMAT 与 strftime 在这两个格式上含义一致，直接复用
+            for granularity, bucket_format in ROLLUP_GRANULARITIES.items():
+                bucket = f"DATE_FORMAT(STR_TO_DATE(createdAt, '%Y-%m-%d %H:%i:%s'), '{bucket_format}')"
+                cursor.execute(f"""
+                INSERT INTO account_rollups (username, granularity, bucket_start, tweet_count, like_sum, retweet_sum, view_sum)
+                SELECT username, '{granularity}', {bucket}, COUNT(*),
+                       SUM(COALESCE(likeCount, 0)), SUM(COALESCE(retweetCount, 0)), SUM(COALESCE(viewCount, 0))
+                FROM tweets
+                WHERE {bucket} IS NOT NULL
+                GROUP BY username, {bucket}
+                """)
+                for metric, column in metric_columns.items():
+                    # 与 engagement_bin 一致：0 -> 0，否则为二进制位数
+                    bin_expr = f"IF(COALESCE({column}, 0) <= 0, 0, LEAST(CHAR_LENGTH(BIN({column})), 63))"
+                    cursor.execute(f"""
+                    INSERT INTO account_rollup_hist (username, granularity, bucket_start, metric, bin, count)
+                    SELECT username, '{granularity}', {bucket}, '{metric}', {bin_expr}, COUNT(*)
+                    FROM tweets
+                    WHERE {bucket} IS NOT NULL
+                    GROUP BY username, {bucket}, {bin_expr}
+                    """)
+            self.conn.commit()
+            print("✅ 互动汇总表已根据 tweets 表重建")
+        except Error as e:
+            self.conn.rollback()
+            print(f"❌ 汇总表重建失败: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    def get_conversation_tweets(self, conversation_id, username):
+        """
+        按时间顺序读取某作者自己线程中已入库的推文
+
+        只返回根推文和回复自己的推文，作者在同一会话中回复他人的推文不属于线程。
+        """
+        sql = """
+        SELECT tweet_id, username, text, createdAt AS created_at, ai_summary
+        FROM tweets
+        WHERE conversationId = %s AND username = %s
+          AND (COALESCE(isReply, 0) = 0 OR inReplyToUsername = %s)
+        ORDER BY createdAt, tweet_id
+        """
+        cursor = self.conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, (conversation_id, username, username))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def record_llm_usage(self, tweet, usage):
+        """记录一次摘要生成的模型、token用量、耗时和费用"""
+        sql = """
+        INSERT INTO llm_usage (
+            tweet_id, username, model, reason, skipped,
+            prompt_tokens, completion_tokens, total_tokens, latency_ms, cost
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        values = (
+            tweet.get("tweet_id"),
+            tweet.get("username"),
+            usage.get("model"),
+            usage.get("reason"),
+            usage.get("skipped", False),
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0),
+            usage.get("total_tokens", 0),
+            usage.get("latency_ms", 0),
+            usage.get("cost", 0.0),
+        )
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, values)
+            self.conn.commit()
+        except Error as e:
+            self.conn.rollback()
+            print(f"❌ 用量记录失败: {e}")
+        finally:
+            cursor.close()
+
+    def get_llm_usage_by_account(self, since=None):
+        """按账号和模型汇总大模型用量、平均耗时和费用"""
+        sql = """
+        SELECT username, model,
+               COUNT(*) AS calls, SUM(skipped) AS skipped,
+               SUM(prompt_tokens) AS prompt_tokens, SUM(completion_tokens) AS completion_tokens,
+               SUM(total_tokens) AS total_tokens, AVG(latency_ms) AS avg_latency_ms, SUM(cost) AS cost
+        FROM llm_usage
+        WHERE created_at >= %s
+        GROUP BY username, model
+        ORDER BY cost DESC
+        """
+        cursor = self.conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, (since or "1970-01-01 00:00:00",))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def get_account_rollups(self, username, granularity="hour", since=None):
+        """
+        读取账号的汇总数据，并根据 log2 直方图估算各指标的分位数
+
+        Args:
+            username: 推特用户名
+            granularity: "hour" 或 "day"
+            since: 起始时间 (北京时间字符串)，None 表示全部
+
+        Returns:
+            list: 每个时间桶一条，包含计数、总和以及 p50/p90/p99 近似值
+        """
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"未知的汇总粒度: {granularity}")
+
+        where = "username = %s AND granularity = %s"
+        params = [username, granularity]
+        if since:
+            where += " AND bucket_start >= %s"
+            params.append(since)
+
+        cursor = self.conn.cursor(dictionary=True)
+        try:
+            cursor.execute(f"SELECT * FROM account_rollups WHERE {where} ORDER BY bucket_start", tuple(params))
+            rollups = cursor.fetchall()
+            cursor.execute(
+                f"SELECT bucket_start, metric, bin, count FROM account_rollup_hist WHERE {where} ORDER BY bucket_start, metric, bin",
+                tuple(params)
+            )
+            hist_rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        histograms = {}
+        for row in hist_rows:
+            histograms.setdefault((row["bucket_start"], row["metric"]), []).append((row["bin"], row["count"]))
+
+        for rollup in rollups:
+            for metric in ROLLUP_METRICS.values():
+                bins = histograms.get((rollup["bucket_start"], metric), [])
+                total = sum(count for _, count in bins)
+                for pct in PERCENTILES:
+                    rollup[f"{metric}_p{pct}"] = None
+                    if total == 0:
+                        continue
+                    rank = math.ceil(total * pct / 100)
+                    seen = 0
+                    for bin_index, count in bins:
+                        seen += count
+                        if seen >= rank:
+                            rollup[f"{metric}_p{pct}"] = bin_estimate(bin_index)
+                            break
+        return rollups
+
+    def get_trending_accounts(self, granularity="hour", since=None, order_by="view_sum", limit=10):
+        """
+        按汇总表统计某时间段内互动最高的账号
+
+        汇总表只包含写入后增量累计的数据，部署前已入库的推文需要先执行一次 rebuild_rollups()。
+        """
+        if order_by not in ("tweet_count", "like_sum", "retweet_sum", "view_sum"):
+            raise ValueError(f"不支持的排序字段: {order_by}")
+
+        sql = """
+        SELECT username, SUM(tweet_count) AS tweet_count, SUM(like_sum) AS like_sum,
+               SUM(retweet_sum) AS retweet_sum, SUM(view_sum) AS view_sum
+        FROM account_rollups
+        WHERE granularity = %s AND bucket_start >= %s
+        GROUP BY username
+        """ + f"ORDER BY {order_by} DESC LIMIT %s"
+        cursor = self.conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, (granularity, since or "1970-01-01 00:00:00", limit))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def fetch_recent_engagement(self, usernames, per_account=50):
+        """
+        读取每个账号最近 per_account 条推文的互动数据，用于预热爆款检测基线
+
+        只返回记录了抓取时发布时长的推文，旧数据无法换算成互动速度。
+        """
+        if not usernames:
+            return []
+        placeholders = ", ".join(["%s"] * len(usernames))
+        sql = f"""
+        SELECT username, likeCount, retweetCount, viewCount, fetchAgeSeconds FROM (
+            SELECT username, likeCount, retweetCount, viewCount, fetchAgeSeconds, createdAt,
+                   ROW_NUMBER() OVER (PARTITION BY username ORDER BY createdAt DESC) AS rn
+            FROM tweets
+            WHERE username IN ({placeholders}) AND fetchAgeSeconds IS NOT NULL
+        ) recent
+        WHERE rn <= %s
+        ORDER BY username, createdAt
+        """
+        cursor = self.conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, tuple(usernames) + (per_account,))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def fetch_archive_chunk(self, cutoff, after_key=None, limit=1000):
+        """
+        按 (createdAt, tweet_id) 键集分页读取待归档推文
+
+        Args:
+            cutoff: 截止时间字符串 (北京时间 'YYYY-MM-DD HH:MM:SS')，早于它的推文才会被归档
+            after_key: 上一批最后一行的 (createdAt, tweet_id)，None 表示从头开始
+            limit: 每批最大行数
+
+        Returns:
+            list: 字典形式的行列表
+        """
+        sql = """
+        SELECT tweet_id, username, text, source,
+               retweetCount, replyCount, likeCount, quoteCount, viewCount,
+               createdAt, lang, bookmarkCount, isReply,
+               inReplyToId, conversationId, displayTextRange,
+               inReplyToUserId, inReplyToUsername, author, raw_tweet, ai_summary
+        FROM tweets
+        WHERE archived_at IS NULL AND createdAt < %s
+        """
+        params = [cutoff]
+        if after_key is not None:
+            sql += " AND (createdAt > %s OR (createdAt = %s AND tweet_id > %s))"
+            params.extend([after_key[0], after_key[0], after_key[1]])
+        sql += " ORDER BY createdAt, tweet_id LIMIT %s"
+        params.append(limit)
+
+        cursor = self.conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, tuple(params))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def count_unarchived_between(self, start, end):
+        """统计 [start, end) 时间区间内尚未归档的推文数量"""
+        sql = "SELECT COUNT(*) FROM tweets WHERE archived_at IS NULL AND createdAt >= %s AND createdAt < %s"
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, (start, end))
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def prune_archived(self, tweet_ids, batch_size=500):
+        """
+        瘦身已归档的推文：清空大字段(raw_tweet/author)并打上归档标记
+
+        行本身会保留作为去重的墓碑记录。get_latest_tweets 返回的最新推文可能早于保留期，
+        如果删除行，tweet_exists 会把它们当成新推文重新摘要、推送和归档。
+
+        Args:
+            tweet_ids: 已确认写入归档的 tweet_id 列表
+            batch_size: 每个事务处理的行数，避免长事务
+
+        Returns:
+            int: 受影响的行数
+        """
+        affected = 0
+        cursor = self.conn.cursor()
+        try:
+            for i in range(0, len(tweet_ids), batch_size):
+                batch = tweet_ids[i:i + batch_size]
+                placeholders = ", ".join(["%s"] * len(batch))
+                sql = (f"UPDATE tweets SET raw_tweet = NULL, author = NULL, archived_at = NOW() "
+                       f"WHERE tweet_id IN ({placeholders})")
+                cursor.execute(sql, tuple(batch))
+                self.conn.commit()
+                affected += cursor.rowcount
+        except Error as e:
+            self.conn.rollback()
+            print(f"❌ 归档清理失败: {e}")
+            raise e
+        finally:
+            cursor.close()
+        return affected
@@ -137,6 +137,80 @@ class DingTalkBot:
         title, content = self.format_tweet_message(tweet_data)
         return self.send_markdown_message(title, content)
 
+    def format_thread_message(self, thread_data, total_parts, new_parts, is_update=False):
+        """
+        格式化线程数据为钉钉消息
+        """
+        username = thread_data.get('username', '')
+        text = thread_data.get('text', '')
+        if len(text) > 3000:
+            text = text[:3000] + '...'
+
+        # 钉钉机器人无法编辑已发送的消息，线程有新内容时发送一条更新消息
+        label = "线程更新" if is_update else "新线程"
+        title = f"🧵 {label}提醒 - @{username}"
+        text_content = f"""## 🧵 捕获到{label}！
+
+**👤 用户:** @{username}  
+**🕐 时间:** {thread_data.get('created_at', '')} (北京时间)  
+**🧩 条数:** 共 {total_parts} 条，本次新增 {new_parts} 条  
+
+**📝 内容:**  
+{text}  
+
+**📊 新增部分互动数据:**  
+- 👍 点赞: {thread_data.get('likes', 0)}  
+- 🔄 转推: {thread_data.get('retweets', 0)}  
+- 💬 回复: {thread_data.get('replies', 0)}  
+- 👁️ 浏览: {thread_data.get('views', 0)}  
+
+**🤖 AI摘要:**  
+{thread_data.get('ai_summary', '')}  
+
+---
+*来自 Twitter 实时监控机器人*"""
+
+        return title, text_content
+
+    def send_thread_notification(self, thread_data, total_parts, new_parts, is_update=False):
+        """
+        发送线程通知到钉钉
+        """
+        title, content = self.format_thread_message(thread_data, total_parts, new_parts, is_update)
+        return self.send_markdown_message(title, content)
+
+    def format_viral_alert(self, tweet_data, spike):
+        """
+        格式化爆款推文预警消息
+        """
+        username = tweet_data.get('username', '')
+        metric_labels = {'likes': '点赞', 'retweets': '转推', 'views': '浏览'}
+        metric = metric_labels.get(spike.get('metric'), spike.get('metric'))
+
+        title = f"🚨 爆款预警 - @{username}"
+        text_content = f"""## 🚨 推文互动远超作者日常水平！
+
+**👤 用户:** @{username}  
+**🕐 时间:** {tweet_data.get('created_at', '')} (北京时间)  
+
+**📈 异常指标:** {metric} {spike.get('current')} (日常约 {spike.get('baseline')}，约 {spike.get('ratio')} 倍)  
+**📐 异常分数:** {spike.get('score')}  
+
+**📝 内容:**  
+{tweet_data.get('text', '')}  
+
+---
+*来自 Twitter 实时监控机器人*"""
+
+        return title, text_content
+
+    def send_viral_alert(self, tweet_data, spike):
+        """
+        发送爆款推文预警到钉钉
+        """
+        title, content = self.format_viral_alert(tweet_data, spike)
+        return self.send_markdown_message(title, content)
+
 
 # 单例模式，便于全局使用
 dingtalk_bot = DingTalkBot()
\ No newline at end of file
@@ -0,0 +1,149 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+
+# 参与打分的互动指标 (格式化推文字段, 数据库列)
+SPIKE_METRICS = (("likes", "likeCount"), ("retweets", "retweetCount"), ("views", "viewCount"))
+
+# 各指标触发预警所需的默认最小绝对增量，可通过 VIRAL_MIN_DELTAS 覆盖
+DEFAULT_MIN_DELTAS = {"likes": 50, "retweets": 20, "views": 5000}
+
+
+class ViralSpikeDetector:
+    """
+    爆款推文检测
+
+    推文的互动数会随发布时长增长，因此按抓取时的发布时长换算成每小时互动速度后再比较。
+    每个账号在内存中保存最近 window 条推文的 log1p(每小时互动数) 环形缓冲区，
+    新推文与作者自身基线比较得到 z 分数，同时要求互动数比基线预期至少多出一个绝对值，
+    避免基线接近 0 的账号因为几个点赞就触发预警。打分对整批推文一次性向量化计算。
+    """
+
+    def __init__(self, usernames=None, window=None, threshold=None, min_samples=None):
+        # 加载环境变量
+        load_dotenv()
+
+        self.window = window or int(os.getenv("VIRAL_BASELINE_WINDOW", "50"))  # 基线保留的推文条数
+        self.threshold = threshold or float(os.getenv("VIRAL_Z_THRESHOLD", "3.0"))  # 触发预警的 z 分数
+        self.min_samples = min_samples or int(os.getenv("VIRAL_MIN_SAMPLES", "5"))  # 基线最少样本数
+        self.min_age_hours = float(os.getenv("VIRAL_MIN_AGE_MINUTES") or "15") / 60  # 换算速度时发布时长的下限
+        self.min_std = 0.5  # log 空间下的最小标准差，避免基线过于平稳时误报
+
+        # 各指标触发预警所需的最小绝对增量 (当前互动数 - 基线预期互动数)，格式 likes:50,retweets:20
+        self.min_deltas = dict(DEFAULT_MIN_DELTAS)
+        for item in os.getenv("VIRAL_MIN_DELTAS", "").split(","):
+            if ":" in item:
+                metric, delta = item.split(":", 1)
+                self.min_deltas[metric.strip()] = float(delta)
+        self.min_delta_vector = np.array([self.min_deltas.get(field, 0.0) for field, _ in SPIKE_METRICS])
+
+        usernames = list(dict.fromkeys(usernames or []))
+        self.index = {username: i for i, username in enumerate(usernames)}
+        self.buffer = np.full((len(usernames), self.window, len(SPIKE_METRICS)), np.nan)
+        self.cursor = np.zeros(len(usernames), dtype=np.int64)
+
+    def _account_index(self, username):
+        """获取账号所在行，不存在时扩容"""
+        idx = self.index.get(username)
+        if idx is None:
+            idx = len(self.index)
+            self.index[username] = idx
+            empty = np.full((1, self.window, len(SPIKE_METRICS)), np.nan)
+            self.buffer = np.concatenate([self.buffer, empty])
+            self.cursor = np.append(self.cursor, 0)
+        return idx
+
+    def _age_hours(self, ages):
+        """抓取时的发布时长 (秒) 换算为小时，并限制下限"""
+        return np.maximum(np.array(ages, dtype=np.float64) / 3600, self.min_age_hours)
+
+    @staticmethod
+    def _count_matrix(tweets, keys):
+        return np.array(
+            [[max(float(tweet.get(key) or 0), 0.0) for key in keys] for tweet in tweets],
+            dtype=np.float64
+        ).reshape(len(tweets), len(keys))
+
+    def _append(self, indices, values):
+        for idx, row in zip(indices, values):
+            self.buffer[idx, self.cursor[idx] % self.window] = row
+            self.cursor[idx] += 1
+
+    def _add(self, tweets, keys, age_key):
+        """把带发布时长的推文按 log1p(每小时互动数) 计入基线，发布时长未知的推文跳过"""
+        tweets = [tweet for tweet in tweets if tweet.get(age_key) is not None]
+        if not tweets:
+            return 0
+        indices = [self._account_index(tweet["username"]) for tweet in tweets]
+        age_hours = self._age_hours([tweet[age_key] for tweet in tweets])
+        self._append(indices, np.log1p(self._count_matrix(tweets, keys) / age_hours[:, None]))
+        return len(tweets)
+
+    def load_history(self, rows):
+        """用数据库中的历史互动数据预热基线 (行按时间升序，需要 fetchAgeSeconds 列)"""
+        loaded = self._add(rows or [], [column for _, column in SPIKE_METRICS], "fetchAgeSeconds")
+        if loaded:
+            print(f"📈 爆款检测基线已加载: {loaded} 条历史推文, {len(self.index)} 个账号")
+
+    def observe(self, tweets):
+        """把新推文计入作者基线"""
+        self._add(tweets or [], [field for field, _ in SPIKE_METRICS], "age_seconds")
+
+    def score(self, tweets):
+        """
+        批量计算推文相对作者基线的异常程度
+
+        Args:
+            tweets: 格式化后的推文列表 (需要 age_seconds，缺失时不打分)
+
+        Returns:
+            list: 与输入一一对应，未触发预警为 None，触发时为包含分数、主要指标和倍数的字典
+        """
+        if not tweets:
+            return []
+
+        indices = np.array([self._account_index(tweet["username"]) for tweet in tweets], dtype=np.int64)
+        known_age = np.array([tweet.get("age_seconds") is not None for tweet in tweets])
+        age_hours = self._age_hours([tweet.get("age_seconds") or 0 for tweet in tweets])  # (m,)
+        counts_now = self._count_matrix(tweets, [field for field, _ in SPIKE_METRICS])  # (m, k)
+        values = np.log1p(counts_now / age_hours[:, None])
+        history = self.buffer[indices]  # (m, window, k)
+
+        valid = ~np.isnan(history)
+        counts = valid.sum(axis=1)  # (m, k)
+        safe_counts = np.maximum(counts, 1)
+        mean = np.where(valid, history, 0.0).sum(axis=1) / safe_counts
+        deviation = np.where(valid, history - mean[:, None, :], 0.0)
+        std = np.sqrt((deviation ** 2).sum(axis=1) / np.maximum(counts - 1, 1))
+        std = np.maximum(std, self.min_std)
+
+        # 基线预期互动数 = 基线每小时互动数 × 当前推文的发布时长
+        expected = np.expm1(mean) * age_hours[:, None]
+        z_scores = (values - mean) / std
+        eligible = ((counts >= self.min_samples)
+                    & (counts_now - expected >= self.min_delta_vector)
+                    & known_age[:, None])
+        z_scores = np.where(eligible, z_scores, -np.inf)
+
+        best_metric = z_scores.argmax(axis=1)
+        rows = np.arange(len(tweets))
+        best_score = z_scores[rows, best_metric]
+        spikes = best_score >= self.threshold
+
+        results = []
+        for i in range(len(tweets)):
+            if not spikes[i]:
+                results.append(None)
+                continue
+            metric = best_metric[i]
+            baseline = float(expected[i, metric])
+            current = float(counts_now[i, metric])
+            results.append({
+                "score": round(float(best_score[i]), 2),
+                "metric": SPIKE_METRICS[metric][0],
+                "current": int(round(current)),
+                "baseline": int(round(baseline)),
+                "ratio": round(current / max(baseline, 1.0), 1),
+            })
+        return results
@@ -0,0 +1,145 @@
+import os
+import re
+import unicodedata
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+
+URL_PATTERN = re.compile(r"https?://\S+")
+MENTION_PATTERN = re.compile(r"@\w+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# 媒体类型的中文名称 (含量词)
+MEDIA_LABELS = {"photo": "张图片", "video": "段视频", "animated_gif": "个GIF"}
+
+# 各模型价格 (元/千tokens，输入, 输出)，可按阿里云百炼官网价格调整
+MODEL_PRICES = {
+    "qwen-flash": (0.00015, 0.0015),
+    "qwen-plus": (0.0008, 0.002),
+    "qwen-max": (0.0024, 0.0096),
+}
+
+
+def compact_text(text):
+    """去掉链接并压缩空白，减少提示词长度"""
+    text = URL_PATTERN.sub("[链接]", text or "")
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def weighted_length(text):
+    """
+    去掉链接、@提及后文字和数字字符的加权长度
+
+    与推特的字数规则一致，中日韩等全角字符按2计，其余按1计，
+    这样同一阈值对中文和英文推文的信息量大致相当。
+    """
+    text = MENTION_PATTERN.sub("", URL_PATTERN.sub("", text or ""))
+    return sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+               for ch in text if unicodedata.category(ch)[0] in ("L", "N"))
+
+
+def media_types(formatted_tweet):
+    """
+    推文附带的媒体类型列表
+
+    图片/视频的 t.co 链接不在 entities.urls 中，需要从 extendedEntities.media、
+    entities.media 或 attachments 中读取。
+    """
+    raw_tweet = formatted_tweet.get('raw_tweet') or {}
+    for source in (formatted_tweet, raw_tweet):
+        for container in ("extendedEntities", "extended_entities", "entities"):
+            media = (source.get(container) or {}).get('media') or []
+            if media:
+                return [item.get('type') or "photo" for item in media]
+        attachments = source.get('attachments') or {}
+        media = attachments.get('media') or attachments.get('media_keys') or []
+        if media:
+            return [(item.get('type') or "photo") if isinstance(item, dict) else "photo" for item in media]
+    return []
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """根据 token 数估算费用 (元)"""
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return round((prompt_tokens or 0) / 1000 * input_price + (completion_tokens or 0) / 1000 * output_price, 6)
+
+
+class SummaryPolicy:
+    """
+    摘要策略：决定推文是否需要调用大模型，以及使用哪个模型
+
+    - 纯媒体、纯链接、纯@提及、纯表情或过短的推文使用模板摘要，不调用大模型
+    - 爆款推文使用 qwen-max，长推文或高互动速度推文使用 qwen-plus，其余使用 qwen-flash
+    """
+
+    def __init__(self):
+        # 加载环境变量
+        load_dotenv()
+
+        self.min_chars = int(os.getenv("SUMMARY_MIN_CHARS", "12"))  # 低于该加权字数视为过短推文
+        self.long_chars = int(os.getenv("SUMMARY_LONG_CHARS", "160"))  # 超过该加权字数视为长推文
+        self.high_velocity = float(os.getenv("SUMMARY_HIGH_VELOCITY", "1000"))  # 高互动速度阈值(每小时)
+        self.cheap_model = os.getenv("SUMMARY_CHEAP_MODEL", "qwen-flash")
+        self.standard_model = os.getenv("SUMMARY_STANDARD_MODEL", "qwen-plus")
+        self.premium_model = os.getenv("SUMMARY_PREMIUM_MODEL", "qwen-max")
+
+    def decide(self, formatted_tweet):
+        """
+        为推文选择摘要方式
+
+        Returns:
+            dict: {"action": "template" 或 "llm", "model": 模型名或 None, "reason": 原因}
+        """
+        text = formatted_tweet.get('text', '') or ''
+        length = weighted_length(text)
+
+        if length == 0:
+            if media_types(formatted_tweet):
+                reason = "media_only"
+            elif URL_PATTERN.search(text):
+                reason = "link_only"
+            elif MENTION_PATTERN.search(text):
+                reason = "mention_only"
+            else:
+                reason = "emoji_only"
+            return {"action": "template", "model": None, "reason": reason}
+        if length < self.min_chars:
+            return {"action": "template", "model": None, "reason": "too_short"}
+
+        if formatted_tweet.get('viral_spike'):
+            return {"action": "llm", "model": self.premium_model, "reason": "viral"}
+        if length >= self.long_chars:
+            return {"action": "llm", "model": self.standard_model, "reason": "long"}
+        if (formatted_tweet.get('engagement_velocity') or 0) >= self.high_velocity:
+            return {"action": "llm", "model": self.standard_model, "reason": "high_engagement"}
+        return {"action": "llm", "model": self.cheap_model, "reason": "short"}
+
+    @staticmethod
+    def template_summary(formatted_tweet, reason):
+        """不调用大模型时使用的模板摘要"""
+        text = formatted_tweet.get('text', '') or ''
+        username = formatted_tweet.get('username', '')
+
+        if reason == "media_only":
+            counts = {}
+            for media_type in media_types(formatted_tweet):
+                label = MEDIA_LABELS.get(media_type, "个媒体文件")
+                counts[label] = counts.get(label, 0) + 1
+            media = "、".join(f"{count} {label}" for label, count in counts.items()) or "媒体"
+            return f"@{username} 发布了 {media}，无正文内容。"
+        if reason == "link_only":
+            # 正文里都是 t.co 短链，优先使用 entities 中展开后的地址
+            entity_urls = (formatted_tweet.get('entities') or {}).get('urls') or []
+            urls = [item.get('expanded_url') for item in entity_urls if item.get('expanded_url')]
+            domains = []
+            for url in urls or URL_PATTERN.findall(text):
+                domain = urlparse(url).netloc
+                if domain and domain not in domains:
+                    domains.append(domain)
+            return f"@{username} 分享了链接 ({', '.join(domains) or '未知来源'})，无正文内容。"
+        if reason == "mention_only":
+            mentions = list(dict.fromkeys(MENTION_PATTERN.findall(text)))
+            return f"@{username} 提及了 {' '.join(mentions)}，无正文内容。"
+        if reason == "emoji_only":
+            return f"@{username} 发布了仅含表情/符号的推文: {compact_text(text)}"
+        return f"@{username} 发布了简短推文: {compact_text(text)}"
@@ -0,0 +1,79 @@
+import os
+import time
+from dotenv import load_dotenv
+
+
+class ThreadAggregator:
+    """
+    按 (作者, conversationId) 聚合作者自己线程中的新推文
+
+    同一会话的推文在防抖窗口内不断到达时先暂存，窗口内没有新推文 (或等待超过上限) 后
+    合并成一条线程交给后续的摘要/推送流程。爆款推文不等待，立即输出。
+    """
+
+    def __init__(self):
+        # 加载环境变量
+        load_dotenv()
+
+        self.debounce_seconds = float(os.getenv("THREAD_DEBOUNCE_SECONDS", "20"))  # 无新推文多久后输出线程
+        self.max_wait_seconds = float(os.getenv("THREAD_MAX_WAIT_SECONDS", "120"))  # 线程最长等待时间
+
+        self._groups = {}
+
+    @staticmethod
+    def is_self_reply(tweet_data):
+        """是否为作者回复自己 (即自己线程的后续部分)"""
+        author_id = (tweet_data.get('author') or {}).get('id')
+        reply_to = tweet_data.get('inReplyToUserId')
+        return bool(tweet_data.get('isReply') and author_id and reply_to and str(reply_to) == str(author_id))
+
+    @classmethod
+    def thread_key(cls, tweet_data):
+        """自己发起的会话 (根推文或自我回复) 按会话聚合，回复他人的推文各自独立"""
+        conversation_id = tweet_data.get('conversationId')
+        if conversation_id and (not tweet_data.get('isReply') or cls.is_self_reply(tweet_data)):
+            return tweet_data['username'], conversation_id
+        return tweet_data['username'], tweet_data['tweet_id']
+
+    def add(self, tweet_data, now=None):
+        """暂存新推文"""
+        now = time.time() if now is None else now
+        group = self._groups.setdefault(self.thread_key(tweet_data), {"parts": [], "first_seen": now})
+        group["parts"].append(tweet_data)
+        group["last_seen"] = now
+
+    def flush(self, force=False, now=None):
+        """
+        输出已经稳定的线程
+
+        Args:
+            force: True 时输出全部暂存的线程 (轮询模式下每批推文本身就是一个窗口)
+
+        Returns:
+            list: 每个线程的代表推文，thread_parts 字段按时间顺序包含本次新增的全部推文
+        """
+        now = time.time() if now is None else now
+        ready = []
+        for key, group in list(self._groups.items()):
+            settled = now - group["last_seen"] >= self.debounce_seconds
+            expired = now - group["first_seen"] >= self.max_wait_seconds
+            viral = any(part.get('viral_spike') for part in group["parts"])
+            if force or settled or expired or viral:
+                ready.append(self._build_lead(group["parts"]))
+                del self._groups[key]
+        return ready
+
+    @staticmethod
+    def _build_lead(parts):
+        """以最早的推文为代表，优先级相关字段取线程内的最大值"""
+        parts = sorted(parts, key=lambda part: (part.get('created_at') or '', part['tweet_id']))
+        lead = dict(parts[0])
+        lead['thread_parts'] = parts
+        lead['engagement_velocity'] = max(part.get('engagement_velocity') or 0 for part in parts)
+        ages = [part['age_seconds'] for part in parts if part.get('age_seconds') is not None]
+        lead['age_seconds'] = min(ages) if ages else None
+        lead['viral_spike'] = next((part['viral_spike'] for part in parts if part.get('viral_spike')), None)
+        return lead
+
+    def __len__(self):
+        return sum(len(group["parts"]) for group in self._groups.values())
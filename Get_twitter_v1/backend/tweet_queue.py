@@ -0,0 +1,69 @@
+import os
+import math
+import time
+import heapq
+import itertools
+import threading
+from dotenv import load_dotenv
+
+
+class TweetPriorityQueue:
+    """
+    摘要/推送前的优先级队列
+
+    优先级 = 账号权重 × (log1p(互动速度) + 新鲜度) + 爆款加成，
+    并随排队时间线性增长 (老化)，保证普通推文不会被无限推迟。
+    由于所有推文老化速度相同，老化项可以折算进入队时的静态堆键。
+    """
+
+    def __init__(self):
+        # 加载环境变量
+        load_dotenv()
+
+        # 账号权重，格式: user1:2.0,user2:0.5，未配置的账号权重为1
+        self.account_weights = {}
+        for item in os.getenv("ACCOUNT_WEIGHTS", "").split(","):
+            if ":" in item:
+                username, weight = item.split(":", 1)
+                self.account_weights[username.strip()] = float(weight)
+
+        self.recency_weight = float(os.getenv("PRIORITY_RECENCY_WEIGHT", "2.0"))  # 新鲜度项权重
+        self.recency_half_life = float(os.getenv("PRIORITY_RECENCY_HALF_LIFE", "3600"))  # 新鲜度半衰期(秒)
+        self.aging_rate = float(os.getenv("PRIORITY_AGING_PER_MINUTE", "1.0")) / 60  # 每秒排队增加的优先级
+        self.viral_bonus = float(os.getenv("PRIORITY_VIRAL_BONUS", "10.0"))  # 爆款推文额外加成
+
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def score(self, tweet_data):
+        """计算推文入队时的基础优先级"""
+        weight = self.account_weights.get(tweet_data.get('username'), 1.0)
+        velocity = tweet_data.get('engagement_velocity') or 0.0
+        age = tweet_data.get('age_seconds')
+        recency = 0.0 if age is None else math.pow(0.5, max(age, 0) / self.recency_half_life)
+
+        priority = weight * (math.log1p(velocity) + self.recency_weight * recency)
+        if tweet_data.get('viral_spike'):
+            priority += self.viral_bonus
+        return priority
+
+    def push(self, tweet_data):
+        """推文入队"""
+        priority = self.score(tweet_data)
+        tweet_data['priority'] = round(priority, 3)
+        # 有效优先级 = priority + aging_rate × (now - enqueued_at)，now 对所有元素相同，可以省去
+        key = -(priority - self.aging_rate * time.time())
+        with self._lock:
+            heapq.heappush(self._heap, (key, next(self._counter), tweet_data))
+
+    def pop(self):
+        """取出当前有效优先级最高的推文，队列为空时返回 None"""
+        with self._lock:
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)[2]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
@@ -0,0 +1,84 @@
+import os
+import hmac
+import threading
+from flask import Flask, request, jsonify
+from dotenv import load_dotenv
+
+
+def create_webhook_app(monitor):
+    """
+    创建接收 twitterapi.io 过滤规则推送的 Flask 应用
+
+    接口只做校验和入队，格式化、去重、摘要和推送都由监控主线程完成，
+    因此 Flask 线程不会访问数据库连接。
+
+    Args:
+        monitor: TwitterAPIIOMonitor 实例
+
+    Returns:
+        Flask: 应用实例
+    """
+    load_dotenv()
+
+    app = Flask(__name__)
+    app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("WEBHOOK_MAX_BYTES", str(5 * 1024 * 1024)))
+    webhook_path = os.getenv("WEBHOOK_PATH", "/webhook/twitter")
+    target_users = {user.lower(): user for user in monitor.target_users}
+
+    @app.route("/health", methods=["GET"])
+    def health():
+        return jsonify({"status": "ok", "pending": len(monitor.tweet_queue)})
+
+    @app.route(webhook_path, methods=["POST"])
+    def receive_tweets():
+        # twitterapi.io 推送时会在 X-API-Key 头中带上账号的 API Key
+        api_key = request.headers.get("X-API-Key", "")
+        if not hmac.compare_digest(api_key.encode("utf-8"), monitor.api_key.encode("utf-8")):
+            print("⚠️ Webhook 校验失败，拒绝请求")
+            return jsonify({"status": "error", "message": "unauthorized"}), 401
+
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({"status": "error", "message": "invalid json"}), 400
+
+        # 非推文事件 (例如控制台的连通性测试) 直接确认
+        if payload.get("event_type", "tweet") != "tweet":
+            return jsonify({"status": "ok", "accepted": 0})
+
+        tweets = payload.get("tweets") or []
+        accepted = 0
+        rejected = 0
+        for tweet in tweets:
+            if not isinstance(tweet, dict) or not tweet.get("id"):
+                rejected += 1
+                continue
+            # 只接收 TARGET_USERS 中的作者，过期规则或同一 API Key 下其他程序的规则推送的推文直接丢弃
+            author = (tweet.get("author") or {}).get("userName") or ""
+            username = target_users.get(author.lower())
+            if not username:
+                rejected += 1
+                continue
+            monitor.ingest_raw_tweet(username, tweet, source="webhook")
+            accepted += 1
+
+        print(f"📥 Webhook 收到 {len(tweets)} 条推文，入队 {accepted} 条，拒绝 {rejected} 条 (规则: {payload.get('rule_tag')})")
+        return jsonify({"status": "ok", "accepted": accepted, "rejected": rejected})
+
+    return app
+
+
+def start_webhook_server(monitor):
+    """在后台线程中启动 Webhook 服务"""
+    load_dotenv()
+    host = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    port = int(os.getenv("WEBHOOK_PORT", "5000"))
+
+    app = create_webhook_app(monitor)
+    thread = threading.Thread(
+        target=app.run,
+        kwargs={"host": host, "port": port, "threaded": True, "use_reloader": False},
+        daemon=True
+    )
+    thread.start()
+    print(f"🌐 Webhook 服务已启动: http://{host}:{port}{os.getenv('WEBHOOK_PATH', '/webhook/twitter')}")
+    return thread
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import requests
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+
+def build_sample_payload(username, count=1):
+    """构造与 twitterapi.io 过滤规则推送格式一致的测试数据"""
+    now = datetime.now(timezone.utc)
+    tweets = []
+    for i in range(count):
+        tweet_id = str(int(time.time() * 1000) * 10 + i)
+        tweets.append({
+            "type": "tweet",
+            "id": tweet_id,
+            "url": f"https://x.com/{username}/status/{tweet_id}",
+            "text": f"本地Webhook测试推文 #{i + 1}",
+            "source": "Webhook Test Sender",
+            "retweetCount": 0,
+            "replyCount": 0,
+            "likeCount": 0,
+            "quoteCount": 0,
+            "viewCount": 0,
+            "createdAt": now.strftime("%a %b %d %H:%M:%S %z %Y"),
+            "lang": "zh",
+            "isReply": False,
+            "conversationId": tweet_id,
+            "author": {"userName": username, "name": username},
+        })
+
+    return {
+        "event_type": "tweet",
+        "rule_id": "local-test",
+        "rule_tag": "get_twitter_v1-test",
+        "rule_value": f"from:{username}",
+        "tweets": tweets,
+        "timestamp": int(time.time() * 1000),
+    }
+
+
+def main():
+    """
+    本地模拟 twitterapi.io 向 Webhook 推送推文
+
+    用法: python webhook_test_sender.py [用户名] [条数]
+    """
+    load_dotenv()
+
+    target_users = [user.strip() for user in os.getenv("TARGET_USERS", "whyyoutouzhele").split(",") if user.strip()]
+    username = sys.argv[1] if len(sys.argv) > 1 else target_users[0]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    port = os.getenv("WEBHOOK_PORT", "5000")
+    path = os.getenv("WEBHOOK_PATH", "/webhook/twitter")
+    url = f"http://127.0.0.1:{port}{path}"
+
+    resp = requests.post(
+        url,
+        headers={"X-API-Key": os.getenv("TWITTER_API_KEY", ""), "Content-Type": "application/json"},
+        json=build_sample_payload(username, count),
+        timeout=10
+    )
+    print(f"📤 已向 {url} 发送 {count} 条测试推文: {resp.status_code} - {resp.text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import os
+import sys
+
+# 后端模块按脚本方式互相导入，测试时把 backend 目录加入搜索路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# 导入模块时会读取这些配置，测试中使用占位值，不会访问外部服务
+for key, value in {
+    "TWITTER_API_KEY": "test-key",
+    "DASHSCOPE_API_KEY": "test-key",
+    "DINGTALK_ACCESS_TOKEN": "test-token",
+    "TARGET_USERS": "alice",
+    "MONITOR_INTERVAL": "300",
+    "MAX_TWEETS_PER_REQUEST": "5",
+}.items():
+    os.environ.setdefault(key, value)
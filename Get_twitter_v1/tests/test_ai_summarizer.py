@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ai_summarizer import AISummarizer
+
+
+class FakeCompletions:
+    def __init__(self, usage):
+        self.usage = usage
+        self.models = []
+
+    def create(self, model, messages, **kwargs):
+        self.models.append(model)
+        message = SimpleNamespace(content="  摘要内容  ")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=self.usage)
+
+
+def make_summarizer(usage):
+    summarizer = AISummarizer()
+    completions = FakeCompletions(usage)
+    summarizer.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return summarizer, completions
+
+
+def test_summarize_records_usage_and_cost():
+    usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=200, total_tokens=1200)
+    summarizer, completions = make_summarizer(usage)
+
+    summary, record = summarizer.summarize({"username": "alice", "text": "某地发生强烈地震，多栋房屋倒塌"})
+
+    assert summary == "摘要内容"
+    assert completions.models == ["qwen-flash"]
+    assert record["model"] == "qwen-flash"
+    assert record["skipped"] is False
+    assert (record["prompt_tokens"], record["completion_tokens"], record["total_tokens"]) == (1000, 200, 1200)
+    # 1000/1000 * 0.00015 + 200/1000 * 0.0015
+    assert record["cost"] == pytest.approx(0.00045)
+    assert record["latency_ms"] >= 0
+
+
+def test_summarize_without_usage_records_zero_tokens():
+    summarizer, _ = make_summarizer(None)
+
+    summary, record = summarizer.summarize({"username": "alice", "text": "某地发生强烈地震，多栋房屋倒塌"})
+
+    assert summary == "摘要内容"
+    assert (record["prompt_tokens"], record["total_tokens"], record["cost"]) == (0, 0, 0.0)
+
+
+def test_template_tweet_skips_client():
+    summarizer, completions = make_summarizer(None)
+
+    summary, record = summarizer.summarize({"username": "alice", "text": "@bob"})
+
+    assert record["skipped"] is True
+    assert record["reason"] == "mention_only"
+    assert completions.models == []
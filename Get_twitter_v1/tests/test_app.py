@@ -0,0 +1,232 @@
+from datetime import datetime, timezone, timedelta
+
+from App import TwitterAPIIOMonitor
+
+
+def make_monitor():
+    # 跳过 __init__，避免连接数据库和外部服务
+    return TwitterAPIIOMonitor.__new__(TwitterAPIIOMonitor)
+
+
+def test_format_tweet_computes_age_and_velocity():
+    created_at = datetime.now(timezone.utc) - timedelta(minutes=30)
+    tweet = {
+        "id": "1",
+        "text": "hello",
+        "createdAt": created_at.strftime("%a %b %d %H:%M:%S %z %Y"),
+        "likeCount": 1000,
+        "retweetCount": 500,
+        "viewCount": 100000,
+    }
+
+    formatted = make_monitor().format_tweet(tweet, "alice")
+
+    assert 1700 <= formatted["age_seconds"] <= 1900
+    # (1000 + 2 * 500 + 100000 / 100) / 0.5 小时 ≈ 6000
+    assert 5500 <= formatted["engagement_velocity"] <= 6500
+
+
+def test_format_tweet_without_timestamp_has_no_velocity():
+    formatted = make_monitor().format_tweet({"id": "1", "text": "hello", "likeCount": 10}, "alice")
+
+    assert formatted["age_seconds"] is None
+    assert formatted["engagement_velocity"] == 0.0
+
+
+class FakeDB:
+    def __init__(self, stored=None):
+        self.stored = stored or []
+        self.inserted = []
+        self.lookups = 0
+
+    def get_conversation_tweets(self, conversation_id, username):
+        self.lookups += 1
+        # 与 TweetDatabase.get_conversation_tweets 一致，只返回根推文和回复自己的推文
+        return [row for row in self.stored if row["conversationId"] == conversation_id
+                and (not row.get("isReply") or row.get("inReplyToUsername") == username)]
+
+    def insert_tweet(self, tweet):
+        self.inserted.append(tweet["tweet_id"])
+
+    def record_llm_usage(self, tweet, usage):
+        pass
+
+
+class FakeSummarizer:
+    def __init__(self):
+        self.texts = []
+
+    def summarize(self, tweet):
+        self.texts.append(tweet["text"])
+        return "summary", {"model": None, "skipped": True}
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_tweet_notification(self, tweet):
+        self.sent.append(("single", tweet["tweet_id"]))
+        return True
+
+    def send_thread_notification(self, thread, total, new, is_update=False):
+        self.sent.append(("thread", total, new, is_update))
+        return True
+
+
+def make_thread_monitor(monkeypatch, stored=None):
+    import App
+    from thread_aggregator import ThreadAggregator
+    from tweet_queue import TweetPriorityQueue
+
+    bot = FakeBot()
+    monkeypatch.setattr(App, "dingtalk_bot", bot)
+    monkeypatch.setattr(App.time, "sleep", lambda seconds: None)
+
+    monitor = make_monitor()
+    monitor.db = FakeDB(stored)
+    monitor.ai_summarizer = FakeSummarizer()
+    monitor.tweet_queue = TweetPriorityQueue()
+    monitor.thread_aggregator = ThreadAggregator()
+    monitor.pending_ids = set()
+    return monitor, bot
+
+
+def make_part(tweet_id, conversation_id, reply_to_user=None):
+    return {
+        "username": "alice", "tweet_id": tweet_id, "text": f"part {tweet_id}",
+        "created_at": "2025-11-22 12:00:00", "conversationId": conversation_id,
+        "isReply": reply_to_user is not None, "inReplyToUserId": reply_to_user,
+        "author": {"id": "100", "userName": "alice"},
+        "likes": 0, "retweets": 0, "replies": 0, "views": 0,
+    }
+
+
+def test_self_reply_sends_thread_update(monkeypatch):
+    stored = [
+        {"conversationId": "10", "text": "part 10"},
+        {"conversationId": "10", "text": "part 11", "isReply": True, "inReplyToUsername": "alice"},
+        {"conversationId": "10", "text": "reply to bob", "isReply": True, "inReplyToUsername": "bob"},
+    ]
+    monitor, bot = make_thread_monitor(monkeypatch, stored)
+
+    monitor.thread_aggregator.add(make_part("12", "10", reply_to_user="100"))
+    monitor.flush_threads(force=True)
+
+    assert monitor.process_next_tweet() == 1
+    assert bot.sent == [("thread", 3, 1, True)]
+    assert monitor.ai_summarizer.texts[0].startswith("(1/3) part 10")
+    assert "reply to bob" not in monitor.ai_summarizer.texts[0]
+    assert monitor.db.inserted == ["12"]
+
+
+def test_reply_in_others_conversation_is_single(monkeypatch):
+    stored = [{"conversationId": "50", "text": "earlier reply"}]
+    monitor, bot = make_thread_monitor(monkeypatch, stored)
+
+    monitor.thread_aggregator.add(make_part("52", "50", reply_to_user="999"))
+    monitor.flush_threads(force=True)
+
+    assert monitor.process_next_tweet() == 1
+    assert bot.sent == [("single", "52")]
+    assert monitor.db.lookups == 0
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self.payload = payload or {}
+        self.text = str(self.payload)
+
+    def json(self):
+        return self.payload
+
+
+class FakeRequests:
+    def __init__(self, rules):
+        self.rules = rules
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(("get", url.rsplit("/", 1)[-1], None))
+        return FakeResponse(payload={"rules": self.rules})
+
+    def post(self, url, json=None, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls.append(("post", endpoint, json))
+        return FakeResponse(payload={"rule_id": f"new-{json['tag']}"} if endpoint == "add_rule" else {})
+
+    def delete(self, url, json=None, **kwargs):
+        self.calls.append(("delete", url.rsplit("/", 1)[-1], json))
+        return FakeResponse()
+
+
+def make_rule_monitor(monkeypatch, target_users, rules=None):
+    import App
+
+    fake_requests = FakeRequests(rules or [])
+    monkeypatch.setattr(App, "requests", fake_requests)
+    monitor = make_monitor()
+    monitor.target_users = target_users
+    monitor.base_url = "https://api.example.com"
+    monitor.headers = {}
+    monitor.filter_rule_interval = 60
+    return monitor, fake_requests
+
+
+def test_filter_rule_values_split_at_max_length(monkeypatch):
+    from App import FILTER_RULE_MAX_LENGTH
+
+    users = [f"user{i:02d}" for i in range(40)]
+    monitor, _ = make_rule_monitor(monkeypatch, users)
+
+    values = monitor.build_filter_rule_values()
+
+    assert len(values) > 1
+    assert all(len(value) <= FILTER_RULE_MAX_LENGTH for value in values)
+    assert " OR ".join(values).split(" OR ") == [f"from:{user}" for user in users]
+    assert make_rule_monitor(monkeypatch, ["alice", "bob"])[0].build_filter_rule_values() == ["from:alice OR from:bob"]
+
+
+def test_sync_filter_rules_adds_activates_and_deletes_stale(monkeypatch):
+    rules = [
+        {"rule_id": "keep", "tag": "get_twitter_v1-1", "value": "from:alice OR from:bob"},
+        {"rule_id": "stale", "tag": "get_twitter_v1-2", "value": "from:carol"},
+        {"rule_id": "other", "tag": "someone-else", "value": "from:dave"},
+    ]
+    monitor, fake_requests = make_rule_monitor(monkeypatch, ["alice", "bob", "erin"], rules)
+    # 模拟超长拆分后的两条规则
+    monitor.build_filter_rule_values = lambda: ["from:alice OR from:bob", "from:erin"]
+
+    monitor.sync_filter_rules()
+
+    assert ("delete", "delete_rule", {"rule_id": "stale"}) in fake_requests.calls
+    assert not any(call[2] == {"rule_id": "other"} for call in fake_requests.calls)
+    added = [call[2] for call in fake_requests.calls if call[1] == "add_rule"]
+    assert added == [{"tag": "get_twitter_v1-2", "value": "from:erin", "interval_seconds": 60}]
+    activated = [(call[2]["rule_id"], call[2]["is_effect"]) for call in fake_requests.calls if call[1] == "update_rule"]
+    assert activated == [("keep", 1), ("new-get_twitter_v1-2", 1)]
+
+
+def test_drain_intake_skips_pending_and_stored_ids():
+    import queue
+
+    class SeenDB:
+        def tweet_exists(self, tweet_id):
+            return tweet_id == "stored"
+
+    monitor = make_monitor()
+    monitor.intake = queue.Queue()
+    monitor.pending_ids = {"pending"}
+    monitor.running = True
+    monitor.db = SeenDB()
+
+    assert monitor.drain_intake(timeout=0) == []
+
+    for tweet_id in ("pending", "stored", "fresh", "fresh"):
+        monitor.ingest_raw_tweet("alice", {"id": tweet_id, "text": "hi"})
+    new_tweets = monitor.drain_intake(timeout=0)
+
+    assert [tweet["tweet_id"] for tweet in new_tweets] == ["fresh"]
+    assert monitor.pending_ids == {"pending", "fresh"}
+    assert monitor.intake.empty()
@@ -0,0 +1,131 @@
+import os
+import json
+
+import pytest
+
+from archiver import TweetArchiver, TweetArchiveReader
+
+
+class FakeArchiveDB:
+    """内存中的热表，可以指定第几次清理调用失败"""
+
+    def __init__(self, count, fail_on_prune_call=None):
+        self.rows = {
+            str(i): {"tweet_id": str(i), "username": "alice", "text": f"t{i}",
+                     "createdAt": f"2020-01-01 00:00:{i:02d}", "raw_tweet": '{"id": 1}', "archived_at": None}
+            for i in range(count)
+        }
+        self.fail_on_prune_call = fail_on_prune_call
+        self.prune_calls = 0
+
+    def unarchived(self):
+        return [row for row in self.rows.values() if row["archived_at"] is None]
+
+    def fetch_archive_chunk(self, cutoff, after_key=None, limit=1000):
+        rows = sorted((row for row in self.unarchived() if row["createdAt"] < cutoff),
+                      key=lambda row: (row["createdAt"], row["tweet_id"]))
+        if after_key is not None:
+            rows = [row for row in rows if (row["createdAt"], row["tweet_id"]) > after_key]
+        return rows[:limit]
+
+    def count_unarchived_between(self, start, end):
+        return sum(1 for row in self.unarchived() if start <= row["createdAt"] < end)
+
+    def prune_archived(self, tweet_ids):
+        self.prune_calls += 1
+        if self.prune_calls == self.fail_on_prune_call:
+            raise RuntimeError("db down")
+        for tweet_id in tweet_ids:
+            self.rows[tweet_id].update(raw_tweet=None, archived_at="2020-02-01 00:00:00")
+        return len(tweet_ids)
+
+
+@pytest.fixture
+def archiver_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setenv("ARCHIVE_CHUNK_SIZE", "2")
+    monkeypatch.setenv("ARCHIVE_RETENTION_DAYS", "30")
+    return tmp_path
+
+
+def _manifest(archive_dir):
+    with open(os.path.join(archive_dir, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_prune_failure_keeps_archive_and_resumes(archiver_env):
+    db = FakeArchiveDB(5, fail_on_prune_call=2)
+
+    with pytest.raises(RuntimeError):
+        TweetArchiver(db=db).archive()
+
+    # 前两行已瘦身，但归档文件和清单都保留，状态为待清理
+    entries = _manifest(archiver_env)["files"]
+    assert len(entries) == 1
+    assert entries[0]["prune_status"] == "pending"
+    assert os.path.exists(os.path.join(archiver_env, entries[0]["path"]))
+    assert len(db.unarchived()) == 3
+
+    stats = TweetArchiver(db=db).archive()
+
+    # 重试时继续清理，不会把剩余行写进第二个重叠文件
+    entries = _manifest(archiver_env)["files"]
+    assert stats["resumed"] == 1
+    assert stats["archived"] == 0
+    assert len(entries) == 1
+    assert entries[0]["prune_status"] == "done"
+    assert db.unarchived() == []
+
+
+def test_archive_marks_prune_done(archiver_env):
+    db = FakeArchiveDB(3)
+
+    stats = TweetArchiver(db=db).archive()
+
+    assert stats["archived"] == 3
+    assert [entry["prune_status"] for entry in _manifest(archiver_env)["files"]] == ["done"]
+    # 行保留为去重墓碑，只清空大字段
+    assert len(db.rows) == 3
+    assert all(row["raw_tweet"] is None and row["archived_at"] for row in db.rows.values())
+
+
+def test_blank_settings_fall_back_to_defaults(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for key in ("ARCHIVE_DIR", "ARCHIVE_RETENTION_DAYS", "ARCHIVE_CHUNK_SIZE"):
+        monkeypatch.setenv(key, "")
+
+    archiver = TweetArchiver(db=FakeArchiveDB(0))
+
+    assert archiver.archive_dir == "archive"
+    assert archiver.retention_days == 30
+    assert archiver.chunk_size == 1000
+
+
+def test_reader_round_trip_across_partitions(archiver_env):
+    db = FakeArchiveDB(0)
+    for i, date in enumerate(["2020-01-01", "2020-01-01", "2020-01-02", "2020-01-03"]):
+        db.rows[str(i)] = {
+            "tweet_id": str(i), "username": "alice", "text": f"t{i}", "createdAt": f"{date} 08:00:0{i}",
+            "likeCount": i, "isReply": 0,
+            "displayTextRange": "[0, 2]", "author": '{"userName": "alice"}', "raw_tweet": f'{{"id": "{i}"}}',
+            "archived_at": None,
+        }
+
+    TweetArchiver(db=db).archive()
+    reader = TweetArchiveReader(str(archiver_env))
+
+    assert [entry["date"] for entry in reader.list_files()] == ["2020-01-01", "2020-01-02", "2020-01-03"]
+    assert reader.count_rows() == 4
+    assert reader.count_rows(start_date="2020-01-02") == 2
+    assert reader.count_rows(end_date="2020-01-01") == 2
+
+    rows = list(reader.iter_rows(start_date="2020-01-01", end_date="2020-01-02"))
+    assert [row["tweet_id"] for row in rows] == ["0", "1", "2"]
+    assert rows[2]["likeCount"] == 2
+    assert rows[2]["isReply"] is False
+    assert rows[2]["author"] == {"userName": "alice"}
+    assert rows[2]["displayTextRange"] == [0, 2]
+    assert rows[2]["raw_tweet"] == {"id": "2"}
+
+    columns = list(reader.iter_rows(start_date="2020-01-03", columns=["tweet_id", "text"]))
+    assert columns == [{"tweet_id": "3", "text": "t3"}]
@@ -0,0 +1,71 @@
+from database import TweetDatabase, engagement_bin, bin_estimate
+
+
+class FakeCursor:
+    def __init__(self, results):
+        self.results = list(results)
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self, results):
+        self.cursor_obj = FakeCursor(results)
+
+    def cursor(self, dictionary=False):
+        return self.cursor_obj
+
+
+def make_db(results):
+    # 跳过 __init__，避免连接数据库
+    db = TweetDatabase.__new__(TweetDatabase)
+    db.conn = FakeConn(results)
+    return db
+
+
+def test_engagement_bin_and_estimate():
+    assert [engagement_bin(v) for v in (None, -3, 0, 1, 2, 3, 4, 1023, 1024)] == [0, 0, 0, 1, 2, 2, 3, 10, 11]
+    assert engagement_bin(2 ** 80) == 63
+    assert [bin_estimate(b) for b in (0, 1, 2, 11)] == [0, 1, 3, 1448]
+    # 代表值落在桶内
+    for b in range(1, 20):
+        assert engagement_bin(bin_estimate(b)) == b
+
+
+def test_account_rollups_percentiles_from_histogram():
+    bucket = "2024-01-01 10:00:00"
+    rollups = [{"bucket_start": bucket, "tweet_count": 10, "like_sum": 0, "retweet_sum": 0, "view_sum": 0}]
+    hist = [
+        {"bucket_start": bucket, "metric": "like", "bin": 1, "count": 5},
+        {"bucket_start": bucket, "metric": "like", "bin": 4, "count": 4},
+        {"bucket_start": bucket, "metric": "like", "bin": 10, "count": 1},
+        {"bucket_start": bucket, "metric": "view", "bin": 0, "count": 10},
+    ]
+    db = make_db([rollups, hist])
+
+    result = db.get_account_rollups("alice", "hour", since="2024-01-01 00:00:00")
+
+    row = result[0]
+    # 10 条中第 5 条落在桶 1，第 9 条落在桶 4，第 10 条落在桶 10
+    assert (row["like_p50"], row["like_p90"], row["like_p99"]) == (1, 11, 724)
+    assert (row["view_p50"], row["view_p90"], row["view_p99"]) == (0, 0, 0)
+    assert (row["retweet_p50"], row["retweet_p90"], row["retweet_p99"]) == (None, None, None)
+    assert db.conn.cursor_obj.executed[0][1] == ("alice", "hour", "2024-01-01 00:00:00")
+
+
+def test_conversation_tweets_only_selects_thread_parts():
+    db = make_db([[]])
+
+    db.get_conversation_tweets("10", "alice")
+
+    sql, params = db.conn.cursor_obj.executed[0]
+    assert "COALESCE(isReply, 0) = 0 OR inReplyToUsername = %s" in sql
+    assert params == ("10", "alice", "alice")
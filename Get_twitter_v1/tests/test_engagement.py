@@ -0,0 +1,95 @@
+import numpy as np
+
+from engagement import ViralSpikeDetector
+
+
+def make_detector(**kwargs):
+    kwargs.setdefault("window", 10)
+    kwargs.setdefault("threshold", 3.0)
+    kwargs.setdefault("min_samples", 5)
+    return ViralSpikeDetector(["alice"], **kwargs)
+
+
+def history(count, likes=10, age_seconds=3600, username="alice"):
+    return [{"username": username, "likeCount": likes + i % 3, "retweetCount": 1, "viewCount": 1000,
+             "fetchAgeSeconds": age_seconds} for i in range(count)]
+
+
+def tweet(likes, age_seconds=3600, username="alice", retweets=1, views=1000):
+    return {"username": username, "likes": likes, "retweets": retweets, "views": views, "age_seconds": age_seconds}
+
+
+def test_spike_and_no_spike():
+    detector = make_detector()
+    detector.load_history(history(8))
+
+    normal, spike = detector.score([tweet(11), tweet(2000)])
+
+    assert normal is None
+    assert spike["metric"] == "likes"
+    assert spike["current"] == 2000
+    assert 9 <= spike["baseline"] <= 12
+    assert spike["score"] >= 3.0
+
+
+def test_counts_are_compared_per_hour_of_age():
+    detector = make_detector()
+    # 基线推文都在发布 1 分钟时被抓取，互动为 0
+    detector.load_history([dict(row, likeCount=0) for row in history(8, age_seconds=60)])
+
+    # 刚发布几分钟的推文有几个赞不算爆款
+    assert detector.score([tweet(4, age_seconds=60)]) == [None]
+    # 发布 10 小时后 30 个赞相当于每小时 3 个，也不算异常
+    assert detector.score([tweet(30, age_seconds=36000)]) == [None]
+    assert detector.score([tweet(600, age_seconds=3600)])[0]["metric"] == "likes"
+
+
+def test_absolute_floor_blocks_small_deltas(monkeypatch):
+    monkeypatch.setenv("VIRAL_MIN_DELTAS", "likes:500")
+    detector = make_detector()
+    detector.load_history(history(8, likes=1))
+
+    assert detector.score([tweet(300)]) == [None]
+    assert detector.score([tweet(800)])[0]["metric"] == "likes"
+
+
+def test_min_samples_gate():
+    detector = make_detector()
+    detector.load_history(history(4))
+    assert detector.score([tweet(5000)]) == [None]
+
+    detector.observe([tweet(10)])
+    assert detector.score([tweet(5000)])[0] is not None
+
+
+def test_unknown_age_is_not_scored_or_observed():
+    detector = make_detector()
+    detector.load_history(history(8) + [dict(history(1)[0], fetchAgeSeconds=None)])
+    assert detector.cursor[0] == 8
+
+    assert detector.score([tweet(5000, age_seconds=None)]) == [None]
+    detector.observe([tweet(5000, age_seconds=None)])
+    assert detector.cursor[0] == 8
+
+
+def test_ring_buffer_wraps_past_window():
+    detector = make_detector(window=4)
+    detector.load_history(history(4, likes=1000))
+    detector.observe([tweet(10), tweet(10), tweet(10), tweet(10), tweet(10), tweet(10)])
+
+    assert detector.cursor[0] == 10
+    # 旧的高互动样本已被覆盖，基线只剩最近 4 条
+    np.testing.assert_allclose(detector.buffer[0, :, 0], np.log1p(10.0))
+
+
+def test_unknown_account_grows_buffer():
+    detector = make_detector()
+    assert detector.buffer.shape == (1, 10, 3)
+
+    detector.observe([tweet(10, username="bob")])
+
+    assert detector.index["bob"] == 1
+    assert detector.buffer.shape == (2, 10, 3)
+    assert list(detector.cursor) == [0, 1]
+    assert detector.score([tweet(5000, username="carol")]) == [None]
+    assert detector.buffer.shape == (3, 10, 3)
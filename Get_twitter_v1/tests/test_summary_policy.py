@@ -0,0 +1,65 @@
+from summary_policy import SummaryPolicy, weighted_length
+
+
+def test_weighted_length_counts_cjk_as_two():
+    assert weighted_length("突发新闻") == 8
+    assert weighted_length("news") == 4
+    assert weighted_length("看这里 https://t.co/abc @someone") == 6
+
+
+def test_short_chinese_news_line_uses_llm():
+    decision = SummaryPolicy().decide({"text": "某地发生强烈地震"})
+
+    assert decision["action"] == "llm"
+    assert decision["model"] == "qwen-flash"
+
+
+def test_full_length_chinese_tweet_is_long():
+    decision = SummaryPolicy().decide({"text": "这是一条比较长的中文推文内容" * 7})
+
+    assert decision["reason"] == "long"
+
+
+def test_link_and_emoji_only_use_template():
+    policy = SummaryPolicy()
+
+    assert policy.decide({"text": "https://t.co/abc"})["reason"] == "link_only"
+    assert policy.decide({"text": "🔥🔥🔥"})["reason"] == "emoji_only"
+
+
+def test_link_only_template_uses_expanded_url_domain():
+    tweet = {
+        "username": "alice",
+        "text": "https://t.co/abc",
+        "entities": {"urls": [{"url": "https://t.co/abc", "expanded_url": "https://www.reuters.com/world/x"}]},
+    }
+
+    summary = SummaryPolicy.template_summary(tweet, "link_only")
+
+    assert "www.reuters.com" in summary
+    assert "t.co" not in summary
+
+
+def test_photo_only_tweet_uses_media_template():
+    tweet = {
+        "username": "alice",
+        "text": "https://t.co/photo",
+        "entities": {},
+        "raw_tweet": {"extendedEntities": {"media": [{"type": "photo"}, {"type": "photo"}, {"type": "video"}]}},
+    }
+
+    decision = SummaryPolicy().decide(tweet)
+    summary = SummaryPolicy.template_summary(tweet, decision["reason"])
+
+    assert decision["reason"] == "media_only"
+    assert "2 张图片" in summary and "1 段视频" in summary
+    assert "t.co" not in summary
+
+
+def test_mention_only_tweet_has_own_reason():
+    tweet = {"username": "alice", "text": "@bob @carol @bob"}
+
+    decision = SummaryPolicy().decide(tweet)
+
+    assert decision["reason"] == "mention_only"
+    assert SummaryPolicy.template_summary(tweet, "mention_only") == "@alice 提及了 @bob @carol，无正文内容。"
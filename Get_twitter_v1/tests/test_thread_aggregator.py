@@ -0,0 +1,57 @@
+from thread_aggregator import ThreadAggregator
+
+
+AUTHOR = {"id": "100", "userName": "alice"}
+
+
+def make_tweet(tweet_id, conversation_id, reply_to_user=None, **extra):
+    tweet = {
+        "username": "alice",
+        "tweet_id": tweet_id,
+        "text": f"part {tweet_id}",
+        "created_at": f"2025-11-22 12:00:{tweet_id}",
+        "conversationId": conversation_id,
+        "isReply": reply_to_user is not None,
+        "inReplyToUserId": reply_to_user,
+        "author": AUTHOR,
+    }
+    tweet.update(extra)
+    return tweet
+
+
+def test_flush_waits_for_debounce_window():
+    aggregator = ThreadAggregator()
+    aggregator.debounce_seconds = 20
+    aggregator.max_wait_seconds = 120
+
+    aggregator.add(make_tweet("10", "10"), now=0)
+    aggregator.add(make_tweet("11", "10", reply_to_user="100"), now=10)
+
+    assert aggregator.flush(now=25) == []
+    leads = aggregator.flush(now=31)
+    assert len(leads) == 1
+    assert leads[0]["tweet_id"] == "10"
+    assert [part["tweet_id"] for part in leads[0]["thread_parts"]] == ["10", "11"]
+    assert len(aggregator) == 0
+
+
+def test_flush_respects_max_wait_and_viral():
+    aggregator = ThreadAggregator()
+    aggregator.debounce_seconds = 20
+    aggregator.max_wait_seconds = 30
+
+    for i, now in enumerate((0, 15, 29)):
+        aggregator.add(make_tweet(f"1{i}", "10", reply_to_user="100" if i else None), now=now)
+    assert len(aggregator.flush(now=31)) == 1
+
+    aggregator.add(make_tweet("20", "20", viral_spike={"score": 5}), now=100)
+    assert len(aggregator.flush(now=100)) == 1
+
+
+def test_replies_to_others_are_not_grouped():
+    aggregator = ThreadAggregator()
+
+    aggregator.add(make_tweet("31", "30", reply_to_user="999"), now=0)
+    aggregator.add(make_tweet("32", "30", reply_to_user="999"), now=0)
+
+    assert sorted(len(lead["thread_parts"]) for lead in aggregator.flush(force=True)) == [1, 1]
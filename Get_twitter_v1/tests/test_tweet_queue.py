@@ -0,0 +1,83 @@
+import math
+
+import pytest
+
+import tweet_queue
+from tweet_queue import TweetPriorityQueue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(tweet_queue.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setenv("ACCOUNT_WEIGHTS", "")
+    monkeypatch.setenv("PRIORITY_RECENCY_WEIGHT", "2.0")
+    monkeypatch.setenv("PRIORITY_RECENCY_HALF_LIFE", "3600")
+    monkeypatch.setenv("PRIORITY_AGING_PER_MINUTE", "1.0")
+    monkeypatch.setenv("PRIORITY_VIRAL_BONUS", "10.0")
+    return TweetPriorityQueue()
+
+
+def make_tweet(tweet_id, velocity=0.0, username="alice", age_seconds=None, viral_spike=None):
+    return {"tweet_id": tweet_id, "username": username, "engagement_velocity": velocity,
+            "age_seconds": age_seconds, "viral_spike": viral_spike}
+
+
+def test_higher_score_pops_first(queue, clock):
+    queue.push(make_tweet("low", velocity=10))
+    queue.push(make_tweet("high", velocity=1000))
+
+    assert len(queue) == 2
+    assert [queue.pop()["tweet_id"], queue.pop()["tweet_id"]] == ["high", "low"]
+    assert queue.pop() is None
+
+
+def test_old_low_score_overtakes_after_waiting(queue, clock):
+    queue.push(make_tweet("old", velocity=0))
+    clock[0] += 60
+    queue.push(make_tweet("new", velocity=math.expm1(3)))  # 优先级 3，"old" 只排队了 1 分钟
+
+    assert queue.pop()["tweet_id"] == "new"
+
+    clock[0] += 180
+    queue.push(make_tweet("newer", velocity=math.expm1(3)))  # "old" 已排队 4 分钟，老化后超过 3
+
+    assert [queue.pop()["tweet_id"] for _ in range(2)] == ["old", "newer"]
+
+
+def test_fifo_among_equal_keys(queue, clock):
+    for tweet_id in ("a", "b", "c"):
+        queue.push(make_tweet(tweet_id, velocity=5))
+
+    assert [queue.pop()["tweet_id"] for _ in range(3)] == ["a", "b", "c"]
+
+
+def test_account_weights_parsing(monkeypatch):
+    monkeypatch.setenv("ACCOUNT_WEIGHTS", " alice:2.5, bob :0.5,invalid,")
+    queue = TweetPriorityQueue()
+
+    assert queue.account_weights == {"alice": 2.5, "bob": 0.5}
+    velocity = math.expm1(2)
+    assert queue.score(make_tweet("1", velocity, username="alice")) == pytest.approx(5.0)
+    assert queue.score(make_tweet("2", velocity, username="bob")) == pytest.approx(1.0)
+    assert queue.score(make_tweet("3", velocity, username="carol")) == pytest.approx(2.0)
+
+
+def test_recency_and_viral_bonus(queue, clock):
+    fresh = make_tweet("fresh", age_seconds=0)
+    half = make_tweet("half", age_seconds=3600)
+    viral = make_tweet("viral", velocity=1, viral_spike={"score": 5.0})
+
+    assert queue.score(fresh) == pytest.approx(2.0)
+    assert queue.score(half) == pytest.approx(1.0)
+    assert queue.score(viral) == pytest.approx(math.log1p(1) + 10.0)
+
+    queue.push(make_tweet("busy", velocity=1000, age_seconds=0))
+    queue.push(viral)
+    assert viral["priority"] == round(math.log1p(1) + 10.0, 3)
+    assert queue.pop()["tweet_id"] == "viral"
@@ -0,0 +1,37 @@
+from tweet_queue import TweetPriorityQueue
+from webhook_server import create_webhook_app
+from webhook_test_sender import build_sample_payload
+
+
+class FakeMonitor:
+    api_key = "test-key"
+    target_users = ["Alice"]
+
+    def __init__(self):
+        self.tweet_queue = TweetPriorityQueue()
+        self.ingested = []
+
+    def ingest_raw_tweet(self, username, tweet, source="webhook"):
+        self.ingested.append((username, tweet["id"], source))
+
+
+def test_rejects_wrong_api_key():
+    monitor = FakeMonitor()
+    client = create_webhook_app(monitor).test_client()
+
+    resp = client.post("/webhook/twitter", json=build_sample_payload("alice"), headers={"X-API-Key": "bad"})
+
+    assert resp.status_code == 401
+    assert monitor.ingested == []
+
+
+def test_accepts_target_users_and_rejects_other_authors():
+    monitor = FakeMonitor()
+    client = create_webhook_app(monitor).test_client()
+    payload = build_sample_payload("alice", 2)
+    payload["tweets"] += build_sample_payload("mallory", 1)["tweets"]
+
+    resp = client.post("/webhook/twitter", json=payload, headers={"X-API-Key": "test-key"})
+
+    assert resp.get_json() == {"status": "ok", "accepted": 2, "rejected": 1}
+    assert [username for username, _, _ in monitor.ingested] == ["Alice", "Alice"]